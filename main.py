@@ -1,4 +1,6 @@
 from model.batch import Batch
+from model.pipeline import Pipeline, PipelineStage
+from model.ingest_ledger import IngestLedger
 from model.disambiguate_bibliographic import DisambiguateBibliographic
 from model.disambiguate_index import DisambiguateIndex
 from model.reference_index import IndexReference
@@ -11,36 +13,59 @@ import os
 import time
 from model.cluster_bibliographic import ClusterSet
 from model.cluster_index import IndexClusterSet
+from model.pdf_parser import ParserConfig
 
 if __name__ == '__main__':
 
     # Parse publication archive and save knowledge graph in a DB
-    def populate_db(limit: int = None, batch_size: int = 100):
+    def populate_db(limit: int = None, batch_size: int = 100, workers: int = os.cpu_count(), cluster: bool = False):
         # Process publication archives in batches
         zip_arr = [f for f in listdir(dir_path) if isfile(join(dir_path, f))]
-        for zip in zip_arr:
-            logger.info("Started corpus processing!")
-            # 1. Parse publication batch
-            corpus_zip_path = join(dir_path, zip)
-            start_idx = 0
-            while limit is None or start_idx < limit:
-                # Full version with reference and index mining
-                batch = Batch.from_zip(zip_path=corpus_zip_path, start=start_idx, size=batch_size,
-                                       extract_bib=True, extract_index=True)
-                # Fast version without PDF mining, use it, e.g., to explore catalogue content
-                # batch = Batch.from_zip(zip_path=corpus_zip_path, start=start_idx, size=batch_size,
-                #                        extract_bib=False, extract_index=False)
-                if batch is not None:
-                    # 2. Cluster similar references in the corpus
-                    # batch.cluster()
-                    # 3. Add batch to the knowledge graph
-                    db.create_graph(batch)
-                    logger.info("Processed and saved the batch!")
-                else:
-                    logger.info("Finished corpus processing!")
-                    break
-                start_idx += batch_size
-            logger.info("Finished corpus processing!")
+        # Reuse PDF layout from previous runs, only reference splitting and parsing are repeated
+        # Books of the same series share column layout, it is validated on the first pages
+        config = ParserConfig(cache_dir=layout_cache_path, profile_path=join(layout_cache_path, "profiles.json"))
+        # Publications saved before an interruption are not parsed again
+        ledger = IngestLedger(ledger_path, db_address)
+        saved_file_names = db.query_pubs_jats_files()
+
+        def parse_batches():
+            for zip in zip_arr:
+                logger.info("Started corpus processing!")
+                # 1. Parse publication batch
+                corpus_zip_path = join(dir_path, zip)
+                # Records follow the DB, e.g., after it was cleared or populated without the ledger
+                ledger.sync(corpus_zip_path, saved_file_names)
+                start_idx = 0
+                while limit is None or start_idx < limit:
+                    # Full version with reference and index mining, publications are parsed in parallel processes
+                    # Books parsed in previous runs with the same settings are restored from the cache
+                    batch = Batch.from_zip(zip_path=corpus_zip_path, start=start_idx, size=batch_size,
+                                           extract_bib=True, extract_index=True, config=config, workers=workers,
+                                           ledger=ledger, cache_dir=publication_cache_path)
+                    # Fast version with metadata only, use it, e.g., to explore catalogue content
+                    # batch = Batch.scan_zip(zip_path=corpus_zip_path, start=start_idx, size=batch_size,
+                    #                        workers=workers)
+                    if batch is None:
+                        break
+                    yield batch
+                    start_idx += batch_size
+                logger.info("Finished corpus processing!")
+
+        def cluster_batch(batch):
+            # 2. Cluster similar references in the corpus
+            batch.cluster()
+            return batch
+
+        def save_batch(batch):
+            # 3. Add batch to the knowledge graph
+            db.create_graph(batch, ledger)
+            logger.info("Processed and saved the batch!")
+
+        # The next batch is parsed while the previous one is clustered and written to the DB
+        stages = [PipelineStage("cluster", cluster_batch)] if cluster else []
+        stages.append(PipelineStage("save", save_batch))
+        Pipeline(stages).run(parse_batches())
+        ledger.close()
 
     # Disambiguate bibliographic references from the DB
     def disambiguate_bib(unprocessed_only: bool = True, limit: int = None, order=0):
@@ -99,18 +124,18 @@ if __name__ == '__main__':
         logger.info("Disambiguated: %d out of %d index references!", count_found, total)
 
     def find_missing_pubs():
+        # Publications are compared by archive entries, no need to parse the archives
+        ledger = IngestLedger(ledger_path, db_address)
         saved_file_names = db.query_pubs_jats_files()
         print(len(saved_file_names))
         zip_arr = [f for f in listdir(dir_path) if isfile(join(dir_path, f))]
         for zip in zip_arr:
-            # 1. Parse publication batch
             corpus_zip_path = join(dir_path, zip)
-            batch = Batch.from_zip(zip_path=corpus_zip_path, extract_bib=False, extract_index=False)
-            all_file_names = [item.jats_file for item in batch.publications]
-            print(len(all_file_names))
-            missing_file_names = [item for item in all_file_names if item not in saved_file_names]
+            ledger.sync(corpus_zip_path, saved_file_names)
+            missing_file_names = ledger.pending(corpus_zip_path)
             print(len(missing_file_names))
             print(missing_file_names)
+        ledger.close()
 
     def cluster_bib():
         cluster_set_bib = ClusterSet()
@@ -137,9 +162,12 @@ if __name__ == '__main__':
 
     # Step 1: extract publications from archive, parse references and indices, cluster, populate the database
     dir_path = "data_all"
+    layout_cache_path = "data_all_layout"
+    ledger_path = "data_all_ledger.db"
+    publication_cache_path = "data_all_publications"
 
     # Use to clean the DB (attention - do not clean KIEM_NEO4J, it takes days to populate!!!)
-    # /* db.clear_graph() */
+    # /* db.clear_graph(ledger=IngestLedger(ledger_path, db_address)) */
 
     # populate_db()
     # db.merge_clusters()
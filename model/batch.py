@@ -4,13 +4,26 @@ from dataclasses import dataclass
 from dataclasses_json import dataclass_json
 from os.path import join
 import zipfile
+import io
 import os
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from lxml import etree
 from model.publication import Publication
+from model.pdf_parser import ParserConfig
+from model.ingest_ledger import IngestLedger
+from model.publication_cache import PublicationCache
 from model.cluster_bibliographic import ClusterSet
 from model.cluster_index import IndexClusterSet
 import logging
 import uuid
 
+# Relative cost of an index part compared to the whole book, see Batch.estimate_cost
+INDEX_COST = 0.5
+# JATS elements that make up most of a book, released after reading in Batch.__scan_jats
+JATS_CONTENT_TAGS = ('sec', 'p', 'ref', 'index-entry')
+
+
 @dataclass_json
 @dataclass
 class Batch:
@@ -21,12 +34,18 @@ class Batch:
     cluster_set_index: IndexClusterSet = None
     extract_bib: bool = True
     extract_index: bool = False
+    parser_config: ParserConfig = None
     start: int = 0
     size: int = 0
     count_idx: int = 0
     count_bib: int = 0
     errors_xml: int = 0
     errors_other: int = 0
+    errors_timeout: int = 0
+    count_skipped: int = 0     # Publications saved in previous runs, according to the ingestion ledger
+    entries: dict = None       # Archive entry name and content hash by publication zip path
+    cache: PublicationCache = None  # Parsed publications from previous runs
+    count_cached: int = 0      # Publications restored from the cache
     UUID: str = None
 
     def __post_init__(self):
@@ -43,6 +62,11 @@ class Batch:
             self.count_bib += 1
         else:
             self.errors_xml += 1
+        if pub._from_cache:
+            self.count_cached += 1
+        for report in pub.pdf_errors:
+            self.errors_timeout += 1
+            self.logger.warning("PDF layout timeout in %s, %s: %s", pub.zip_path, report.file_name, report.message)
 
     def cluster(self):
         # Cluster bibliographic references
@@ -77,6 +101,9 @@ class Batch:
         self.logger.info("\tNumber of index files: %d", self.count_idx)
         self.logger.info("\tFailed to process XML files: %d", self.errors_xml)
         self.logger.info("\tFailed to process publications: %d", self.errors_other)
+        self.logger.info("\tPDF files stopped by timeout: %d", self.errors_timeout)
+        self.logger.info("\tSkipped publications saved before: %d", self.count_skipped)
+        self.logger.info("\tPublications restored from cache: %d", self.count_cached)
 
     @property
     def pub_count(self) -> int:
@@ -110,27 +137,229 @@ class Batch:
 
     # Extract information about a batch of publications
     @classmethod
-    def from_zip(cls, zip_path, extract_bib: bool = True, extract_index: bool = False, start: int = 0, size: int = -1):
+    def from_zip(cls, zip_path, extract_bib: bool = True, extract_index: bool = False, start: int = 0, size: int = -1,
+                 config: ParserConfig = None, workers: int = 1, ledger: IngestLedger = None, cache_dir: str = None):
+        """Parse publications of the archive, publications parsed with the same settings before are restored from
+        the cache folder if it is given"""
         batch_zip = zipfile.ZipFile(zip_path)
-        m = len(batch_zip.namelist())
+        pub_zip_names = batch_zip.namelist()
+        m = len(pub_zip_names)
         end = m if size < 0 else min(start + size, m)
         if m < start or end > m:
+            batch_zip.close()
             return None
         batch = Batch(zip_path=zip_path, publications=[], start=start,
-                      size=end-start, extract_bib=extract_bib, extract_index=extract_index)
-        batch_dir_path = os.path.splitext(zip_path)[0]
-        for i in range(start, end):
-            pub_zip_name = batch_zip.namelist()[i]
-            pub_dir_name = os.path.splitext(pub_zip_name)[0]
-            pub_dir_path = join(batch_dir_path, pub_dir_name)
-            batch_zip.extract(pub_zip_name, pub_dir_path)
-            pub_zip_path = join(pub_dir_path, pub_zip_name)
-            try:
-                pub = Publication.from_zip(pub_zip_path, extract_bib=batch.extract_bib, extract_index=batch.extract_index)
-                batch.add_publication(pub)
-                os.remove(pub_zip_path)
-                os.rmdir(pub_dir_path)
-            except:
+                      size=end-start, extract_bib=extract_bib, extract_index=extract_index, parser_config=config)
+        batch.entries = {}
+        if cache_dir is not None:
+            batch.cache = PublicationCache(cache_dir, version=Publication.parser_version(extract_bib, extract_index,
+                                                                                         config))
+        pub_zip_names = pub_zip_names[start:end]
+        if ledger is not None:
+            # Publications saved in previous runs are skipped unless their content changed
+            committed = ledger.committed(zip_path)
+            pub_zip_names = [pub_zip_name for pub_zip_name in pub_zip_names
+                             if committed.get(pub_zip_name) != ledger.content_hash(batch_zip.getinfo(pub_zip_name))]
+            batch.count_skipped = end - start - len(pub_zip_names)
+        for pub in batch.__iter_publications(batch_zip, pub_zip_names, workers):
+            if isinstance(pub, Exception):
                 batch.errors_other += 1
+            else:
+                batch.add_publication(pub)
+        batch_zip.close()
         batch.log_info()
         return batch
+
+    # Inventory publications of an archive from JATS metadata, bibliography and index are not parsed
+    @classmethod
+    def scan_zip(cls, zip_path, start: int = 0, size: int = -1, workers: int = 1, chunk_size: int = 64):
+        with zipfile.ZipFile(zip_path) as batch_zip:
+            pub_zip_names = batch_zip.namelist()
+        m = len(pub_zip_names)
+        end = m if size < 0 else min(start + size, m)
+        if m < start or end > m:
+            return None
+        batch = Batch(zip_path=zip_path, publications=[], start=start, size=end-start,
+                      extract_bib=False, extract_index=False)
+        # Each task opens the archive once and scans a chunk of publications
+        chunks = [pub_zip_names[idx:min(idx + chunk_size, end)] for idx in range(start, end, chunk_size)]
+        if workers <= 1:
+            for pubs in map(cls.scan_publications, repeat(zip_path), chunks):
+                batch.__add_scanned(pubs)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for pubs in executor.map(cls.scan_publications, repeat(zip_path), chunks):
+                    batch.__add_scanned(pubs)
+        batch.log_info()
+        return batch
+
+    def __add_scanned(self, pubs):
+        for pub in pubs:
+            if pub is None:
+                self.errors_other += 1
+            else:
+                self.publications.append(pub)
+
+    @classmethod
+    def scan_publications(cls, zip_path: str, pub_zip_names: [str]) -> [Publication]:
+        """Read metadata of publications in the archive, None for publications that failed"""
+        pubs = []
+        batch_dir_path = os.path.splitext(zip_path)[0]
+        with zipfile.ZipFile(zip_path) as batch_zip:
+            for pub_zip_name in pub_zip_names:
+                pub_zip_path = join(batch_dir_path, os.path.splitext(pub_zip_name)[0], pub_zip_name)
+                try:
+                    # The nested zip is read from the archive as a stream, only its JATS file is decompressed
+                    with batch_zip.open(pub_zip_name) as pub_file:
+                        pubs.append(Publication.from_zip_meta(pub_zip_path, pub_file))
+                except Exception as e:
+                    logging.getLogger('pdfParser.batch').error("Failed to scan publication %s: %s", pub_zip_name, e)
+                    pubs.append(None)
+        return pubs
+
+    def __iter_publications(self, batch_zip, pub_zip_names, workers: int = 1):
+        # Yield parsed publications in archive order, or the exception raised while parsing
+        batch_dir_path = os.path.splitext(self.zip_path)[0]
+        # Publication keeps the path it would have if extracted, the zip is read from memory
+        tasks = [(join(batch_dir_path, os.path.splitext(pub_zip_name)[0], pub_zip_name), pub_zip_name)
+                 for pub_zip_name in pub_zip_names]
+        for (pub_zip_path, pub_zip_name) in tasks:
+            self.entries[pub_zip_path] = [pub_zip_name, IngestLedger.content_hash(batch_zip.getinfo(pub_zip_name))]
+        if workers <= 1:
+            for (pub_zip_path, pub_zip_name) in tasks:
+                try:
+                    yield self.parse_publication(pub_zip_path, batch_zip.read(pub_zip_name), self.extract_bib,
+                                                 self.extract_index, self.parser_config, self.cache)
+                except Exception as e:
+                    yield e
+            return
+        # Longest publications first, so that a large book at the end of the batch does not leave workers idle
+        order = self.__schedule(batch_zip, pub_zip_names)
+        results = {}
+        next_result = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Few tasks per worker are queued and taken by the first idle worker,
+            # publication zips are read from the archive on submission
+            running = {}
+            for idx in order:
+                (pub_zip_path, pub_zip_name) = tasks[idx]
+                try:
+                    data = batch_zip.read(pub_zip_name)
+                except Exception as e:
+                    # Counted as in serial mode, other publications are parsed
+                    self.logger.error("Failed to process publication: %s", e)
+                    results[idx] = e
+                else:
+                    future = executor.submit(self.parse_publication, pub_zip_path, data, self.extract_bib,
+                                             self.extract_index, self.parser_config, self.cache)
+                    running[future] = idx
+                while len(running) >= 2 * workers:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for done_future in done:
+                        results[running.pop(done_future)] = self.__get_result(done_future)
+                # Completed publications are passed on in archive order
+                while next_result in results:
+                    yield results.pop(next_result)
+                    next_result += 1
+            for future in as_completed(running):
+                results[running[future]] = self.__get_result(future)
+                while next_result in results:
+                    yield results.pop(next_result)
+                    next_result += 1
+
+    def __schedule(self, batch_zip, pub_zip_names) -> [int]:
+        # Indices of publications in the order of decreasing estimated parsing cost
+        estimates = [self.__estimate_size(batch_zip, pub_zip_name) for pub_zip_name in pub_zip_names]
+        # Pages are estimated from the zip size if the page count is missing, or if PDF files are not all in the zip
+        known = [(zip_size, page_count) for (zip_size, page_count, count_index) in estimates if page_count]
+        bytes_per_page = sum(size for (size, _) in known) / sum(count for (_, count) in known) if known else 1
+        costs = [self.estimate_cost(min(page_count or zip_size, zip_size / bytes_per_page), count_index)
+                 for (zip_size, page_count, count_index) in estimates]
+        return sorted(range(len(costs)), key=lambda idx: -costs[idx])
+
+    def __estimate_size(self, batch_zip, pub_zip_name) -> (int, int, int):
+        # Zip size, number of pages and number of index parts to parse
+        zip_size = batch_zip.getinfo(pub_zip_name).file_size
+        page_count = None
+        count_index = 0
+        try:
+            with zipfile.ZipFile(batch_zip.open(pub_zip_name)) as pub_zip:
+                for file_name in pub_zip.namelist():
+                    if file_name.endswith('.xml'):
+                        with pub_zip.open(file_name) as jats_file:
+                            [page_count, count_index] = self.__scan_jats(jats_file, self.extract_index)
+        except Exception as e:
+            # Publication is parsed anyway, the error is counted there
+            self.logger.debug("Failed to estimate size of %s: %s", pub_zip_name, e)
+        return zip_size, page_count, count_index
+
+    @classmethod
+    def __scan_jats(cls, jats_file, count_index_parts: bool) -> (int, int):
+        # Number of pages and index parts read in one streamed pass, books are not kept in memory
+        page_count = None
+        count_index = 0
+        # First title and presence of a PDF link of open book parts
+        parts = []
+        tags = ('book-meta', 'book-page-count', 'book-part', 'title', 'self-uri') + JATS_CONTENT_TAGS
+        for event, element in etree.iterparse(jats_file, events=('start', 'end'), tag=tags):
+            if event == 'start':
+                if element.tag == 'book-part':
+                    parts.append([None, False])
+                continue
+            if element.tag == 'book-page-count':
+                if element.getparent() is not None and element.getparent().tag == 'counts' and page_count is None:
+                    page_count = int(element.get('count'))
+            elif element.tag == 'book-meta':
+                if not count_index_parts:
+                    break
+            elif element.tag == 'title':
+                texts = element.xpath('text()')
+                for part in parts:
+                    if part[0] is None and len(texts) > 0:
+                        part[0] = texts[0]
+            elif element.tag == 'self-uri':
+                for part in parts:
+                    part[1] = True
+            elif element.tag == 'book-part':
+                [title, has_uri] = parts.pop()
+                if has_uri and title is not None and 'index' in title.lower():
+                    count_index += 1
+            if element.tag in JATS_CONTENT_TAGS or element.tag == 'book-part':
+                # Read content is released, large index parts are not kept in memory
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+        return page_count, count_index
+
+    @classmethod
+    def estimate_cost(cls, page_count: float, count_index: int = 0) -> float:
+        """Relative parsing time of a publication"""
+        # Layout analysis time grows with pages, index entries are parsed with a grammar on top of it
+        return page_count * (1 + INDEX_COST * count_index)
+
+    def ledger_entry(self, pub: Publication) -> list:
+        """Archive, entry name and content hash of a parsed publication"""
+        return [self.zip_path] + self.entries[pub.zip_path]
+
+    def __get_result(self, future):
+        try:
+            return future.result()
+        except Exception as e:
+            self.logger.error("Failed to process publication: %s", e)
+            return e
+
+    @classmethod
+    def parse_publication(cls, pub_zip_path: str, data: bytes, extract_bib: bool = True, extract_index: bool = False,
+                          config: ParserConfig = None, cache: PublicationCache = None) -> Publication:
+        """Parse publication zip given as bytes, runs in worker processes in parallel mode"""
+        key = cache.key(data) if cache is not None else None
+        if key is not None:
+            pub = cache.get(key, pub_zip_path)
+            if pub is not None:
+                pub._from_cache = True
+                return pub
+        pub = Publication.from_zip(pub_zip_path, extract_bib=extract_bib, extract_index=extract_index,
+                                   config=config, pub_file=io.BytesIO(data))
+        if key is not None:
+            cache.put(key, pub)
+        return pub
@@ -1,8 +1,12 @@
 from __future__ import annotations
 from dataclasses import dataclass, asdict
 from dataclasses_json import dataclass_json
+from lxml import etree
 import uuid
 
+find_surname = etree.XPath('.//name/surname/text()')
+find_given_names = etree.XPath('.//name/given-names/text()')
+
 
 @dataclass_json
 @dataclass
@@ -22,11 +26,11 @@ class Contributor:
     def from_jats(cls, jats_contrib) -> Contributor:
         self = cls()
         if jats_contrib is not None:
-            contrib_type = jats_contrib.xpath('@contrib-type')
-            if len(contrib_type) > 0:
-                self.type = contrib_type[0]
-                self.surname = ' '.join(jats_contrib.xpath('.//name/surname/text()'))
-                self.given_names = ' '.join(jats_contrib.xpath('.//name/given-names/text()'))
+            contrib_type = jats_contrib.get('contrib-type')
+            if contrib_type is not None:
+                self.type = contrib_type
+                self.surname = ' '.join(find_surname(jats_contrib))
+                self.given_names = ' '.join(find_given_names(jats_contrib))
                 self.full_name = self.surname + ", " + self.given_names
         return self
 
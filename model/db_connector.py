@@ -13,6 +13,7 @@ from model.index_external import ExternalIndex
 from model.cluster_bibliographic import Cluster
 from model.cluster_index import IndexCluster
 from model.batch import Batch
+from model.ingest_ledger import IngestLedger
 from typing import List, Union
 import logging
 
@@ -26,13 +27,16 @@ class DBConnector:
 
     # Delete
 
-    def clear_graph(self, session: Session = None):
+    def clear_graph(self, session: Session = None, ledger: IngestLedger = None):
         if session is None:
             session = self.driver.session()
         cql_delete_relationships = "MATCH (a) -[r] -> () DELETE a, r"
         cql_delete_nodes = "MATCH (a) DELETE a"
         session.run(cql_delete_relationships)
         session.run(cql_delete_nodes)
+        # Publications are no longer saved, they are ingested again
+        if ledger is not None:
+            ledger.clear()
 
     def delete_node(self, node_uuid: str, session: Session = None):
         if session is None:
@@ -296,13 +300,16 @@ class DBConnector:
                 self.create_cluster(cluster, session)
 
     # Create knowledge graph
-    def create_graph(self, batch: Batch):
+    def create_graph(self, batch: Batch, ledger: IngestLedger = None):
         with self.driver.session() as session:
             # Create publications
             if batch.publications:
                 for pub in batch.publications:
                     try:
                         self.create_pub(pub, session)
+                        # Saved publications are skipped when ingestion is restarted
+                        if ledger is not None:
+                            ledger.commit(*batch.ledger_entry(pub), pub.jats_file)
                     except Exception as e:
                         self.logger.error("Failed to serialize publication: %s", pub.zip_path)
                         self.logger.error(e)
@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+from typing import Dict, List, Iterable, Union
+import sqlite3
+import threading
+import zipfile
+import time
+import os
+import logging
+
+module_logger = logging.getLogger('pdfParser.ingest_ledger')
+
+
+@dataclass
+class IngestLedger:
+    """A class for recording publications saved to the knowledge graph, so that interrupted ingestion can resume"""
+    path: str = "ingest_ledger.db"
+    target: str = ""  # Address of the DB publications are saved to, each DB has its own records
+
+    def __post_init__(self):
+        # Publications are recorded by the DB writing thread of the ingestion pipeline
+        self.lock = threading.Lock()
+        self.target = self.target or ""
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS publication (
+            target TEXT NOT NULL, archive TEXT NOT NULL, name TEXT NOT NULL, content_hash TEXT NOT NULL,
+            jats_file TEXT, committed_at REAL NOT NULL, PRIMARY KEY (target, archive, name))""")
+        self.connection.commit()
+
+    @classmethod
+    def archive_key(cls, zip_path: str) -> str:
+        # Archives are identified by file name, the corpus folder may move
+        return os.path.basename(zip_path)
+
+    @classmethod
+    def content_hash(cls, zip_info: zipfile.ZipInfo) -> str:
+        """Hash of an archive entry taken from the zip directory, the content is not read"""
+        return "{0:08x}-{1}".format(zip_info.CRC, zip_info.file_size)
+
+    @classmethod
+    def jats_name(cls, batch_zip: zipfile.ZipFile, name: str) -> Union[str, None]:
+        """Name of the JATS file in a publication zip of the archive, as chosen by Publication"""
+        jats_file = None
+        with zipfile.ZipFile(batch_zip.open(name)) as pub_zip:
+            for file_name in pub_zip.namelist():
+                if file_name.endswith('.xml'):
+                    jats_file = file_name
+        return jats_file
+
+    def commit(self, zip_path: str, name: str, content_hash: str, jats_file: str = None):
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO publication VALUES (?, ?, ?, ?, ?, ?)",
+                                    (self.target, self.archive_key(zip_path), name, content_hash, jats_file,
+                                     time.time()))
+            self.connection.commit()
+
+    def committed(self, zip_path: str) -> Dict[str, str]:
+        """Content hashes of saved publications by the name of their zip in the archive"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT name, content_hash FROM publication WHERE target = ? AND archive = ?",
+                (self.target, self.archive_key(zip_path))).fetchall()
+        return {name: content_hash for (name, content_hash) in rows}
+
+    def sync(self, zip_path: str, saved_jats_files: Iterable[str]):
+        """Align records of an archive with JATS files of publications in the DB: records of publications missing
+        in the DB are dropped, publications saved without a record, e.g., before the ledger was used, are recorded"""
+        saved = set(saved_jats_files)
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT name, jats_file FROM publication WHERE target = ? AND archive = ?",
+                (self.target, self.archive_key(zip_path))).fetchall()
+            dropped = [(self.target, self.archive_key(zip_path), name) for (name, jats_file) in rows
+                       if jats_file not in saved]
+            self.connection.executemany("DELETE FROM publication WHERE target = ? AND archive = ? AND name = ?",
+                                        dropped)
+            self.connection.commit()
+        count_added = 0
+        # Publication zips are opened only to find their JATS file, nothing is parsed
+        if len(saved) > 0:
+            with zipfile.ZipFile(zip_path) as batch_zip:
+                for name in self.pending(zip_path):
+                    try:
+                        jats_file = self.jats_name(batch_zip, name)
+                    except Exception as e:
+                        module_logger.warning("Failed to read publication %s: %s", name, e)
+                        continue
+                    if jats_file in saved:
+                        self.commit(zip_path, name, self.content_hash(batch_zip.getinfo(name)), jats_file)
+                        count_added += 1
+        module_logger.info("Synchronized ledger of %s with the DB: %d records dropped, %d added", zip_path,
+                           len(dropped), count_added)
+
+    def clear(self):
+        """Drop all records of the DB, e.g., when its graph is cleared"""
+        with self.lock:
+            self.connection.execute("DELETE FROM publication WHERE target = ?", (self.target,))
+            self.connection.commit()
+
+    def pending(self, zip_path: str) -> List[str]:
+        """Names of publications in the archive that are not saved or changed since"""
+        committed = self.committed(zip_path)
+        with zipfile.ZipFile(zip_path) as batch_zip:
+            return [info.filename for info in batch_zip.infolist()
+                    if committed.get(info.filename) != self.content_hash(info)]
+
+    def close(self):
+        self.connection.close()
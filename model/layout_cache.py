@@ -0,0 +1,95 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any
+import hashlib
+import gzip
+import json
+import os
+import logging
+
+module_logger = logging.getLogger('pdfParser.layout_cache')
+
+
+@dataclass
+class LayoutCache:
+    """A class for storing line-level PDF layout on disk, addressed by the hash of the PDF content"""
+    cache_dir: str = "layout_cache"
+    max_size: int = 1 << 30  # Maximal total size of cached layouts in bytes, least recently used entries are evicted
+    version: str = ""        # Key of the extraction settings, entries from other settings are never reused
+    suffix = ".json.gz"
+
+    def key(self, data: bytes) -> str:
+        content_hash = hashlib.sha256(data).hexdigest()
+        version_hash = hashlib.sha256(self.version.encode('utf-8')).hexdigest()[:16]
+        return version_hash + "_" + content_hash
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    @classmethod
+    def load(cls, file_path: str) -> Any:
+        """Read a cached value, subclasses store other values by overriding load and dump"""
+        with gzip.open(file_path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    @classmethod
+    def dump(cls, value: Any, file_path: str):
+        with gzip.open(file_path, 'wt', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False, separators=(',', ':'))
+
+    def get(self, key: str) -> Any:
+        file_path = self.path(key)
+        if not os.path.isfile(file_path):
+            return None
+        try:
+            value = self.load(file_path)
+            # Refresh access time for LRU eviction
+            os.utime(file_path)
+            return value
+        except Exception as e:
+            module_logger.warning("Failed to read cache entry %s: %s", file_path, e)
+            return None
+
+    def put(self, key: str, value: Any):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        file_path = self.path(key)
+        tmp_path = file_path + "." + str(os.getpid()) + ".tmp"
+        try:
+            self.dump(value, tmp_path)
+            os.replace(tmp_path, file_path)
+        except Exception as e:
+            module_logger.warning("Failed to write cache entry %s: %s", file_path, e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        # The entry is stored, failed eviction is retried with the next one
+        try:
+            self.evict()
+        except OSError as e:
+            module_logger.warning("Failed to evict cache entries in %s: %s", self.cache_dir, e)
+
+    def evict(self):
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.cache_dir):
+            # Entries can be removed by other processes sharing the folder
+            try:
+                if entry.is_file() and entry.name.endswith(self.suffix):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_size += stat.st_size
+            except OSError:
+                pass
+        if total_size <= self.max_size:
+            return
+        # Oldest first
+        entries.sort()
+        for (mtime, size, file_path) in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(file_path)
+                total_size -= size
+                module_logger.debug("Evicted cache entry: %s", file_path)
+            except OSError:
+                pass
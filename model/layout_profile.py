@@ -0,0 +1,82 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from dataclasses_json import dataclass_json
+from typing import List, Union
+import fcntl
+import json
+import os
+import logging
+
+module_logger = logging.getLogger('pdfParser.layout_profile')
+
+# Profiles read by this process, by file path, with the identity of the file version they were read from
+_loaded_profiles = {}
+
+
+@dataclass_json
+@dataclass
+class LayoutProfile:
+    """A class for holding column starts and trailing dot mode detected in a PDF file"""
+    odd_starts: List[int] = None
+    even_starts: List[int] = None
+    count_last_dot: int = 0  # Number of probed lines ending with a dot, capped as in layout detection
+    count_files: int = 0     # Number of files the profile was detected in
+
+    @property
+    def layout(self) -> list:
+        return [self.odd_starts, self.even_starts, self.count_last_dot]
+
+
+@dataclass
+class LayoutProfileStore:
+    """A class for storing layout profiles of publication series in a JSON file, shared by parallel processes"""
+    path: str = "layout_profiles.json"
+
+    @classmethod
+    def key(cls, series: List[str], page_size: List[int]) -> str:
+        return json.dumps(list(series) + [page_size], ensure_ascii=False)
+
+    def load(self) -> dict:
+        """Profiles by key, the file is read again only after it is replaced"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return {}
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        loaded = _loaded_profiles.get(self.path)
+        if loaded is not None and loaded[0] == version:
+            return loaded[1]
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                profiles = json.load(f)
+        except Exception as e:
+            module_logger.warning("Failed to read layout profiles %s: %s", self.path, e)
+            return {}
+        _loaded_profiles[self.path] = (version, profiles)
+        return profiles
+
+    def get(self, key: str) -> Union[LayoutProfile, None]:
+        profile = self.load().get(key)
+        return LayoutProfile.from_dict(profile) if profile is not None else None
+
+    def put(self, key: str, layout: list):
+        [odd_starts, even_starts, count_last_dot] = layout
+        dir_path = os.path.dirname(self.path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        tmp_path = self.path + "." + str(os.getpid()) + ".tmp"
+        # Profiles stored by other processes between reading and writing the file are not lost
+        with open(self.path + ".lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            profiles = dict(self.load())
+            profile = profiles.get(key)
+            count_files = profile["count_files"] + 1 if profile is not None else 1
+            profiles[key] = LayoutProfile(odd_starts, even_starts, count_last_dot, count_files).to_dict()
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(profiles, f, ensure_ascii=False, indent=1)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                module_logger.warning("Failed to store layout profile %s: %s", self.path, e)
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
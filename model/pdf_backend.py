@@ -0,0 +1,132 @@
+import abc
+import pdfminer
+from dataclasses import dataclass
+from typing import List, Iterator
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTTextContainer, LTChar, LTAnno, LAParams
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.pdfpage import PDFPage
+import logging
+
+module_logger = logging.getLogger('pdfParser.pdf_backend')
+
+
+@dataclass
+class LayoutLine:
+    """A compact record of a text line produced by PDF layout analysis"""
+    page_num: int = 0      # Page number, starting from 1
+    box_idx: int = 0       # Index of the enclosing text box on the page
+    bbox: (float, float, float, float) = None
+    text: str = None       # Decoded text of the line
+    length: int = 0        # Number of characters in the line
+
+
+# Digits drawn from a private use area of some fonts
+private_digits = str.maketrans({chr(63043 + digit): str(digit) for digit in range(10)})
+
+
+class LayoutBackend(object):
+    """An abstract class for extracting text lines with their bounding boxes from PDF files"""
+    __metaclass__ = abc.ABCMeta
+    name: str = None
+
+    @abc.abstractmethod
+    def iter_pages(self, in_file, first_page: int = 0, last_page: int = None,
+                   caching: bool = True) -> Iterator[List[LayoutLine]]:
+        """Yield a list of text line records per page, from first_page (inclusive) to last_page (exclusive),
+        parsed PDF objects are kept for reuse if caching is set"""
+        pass
+
+    @property
+    def settings(self) -> list:
+        """Extraction settings that affect produced line records"""
+        return [self.name]
+
+
+class PdfMinerBackend(LayoutBackend):
+    """Layout extraction with pdfminer high level API, the full page layout is built for each page"""
+    name = "pdfminer"
+
+    def __init__(self, laparams: LAParams = None):
+        self.laparams = laparams if laparams is not None else LAParams()
+
+    @property
+    def settings(self) -> list:
+        return [self.name, pdfminer.__version__, vars(self.laparams)]
+
+    def iter_pages(self, in_file, first_page: int = 0, last_page: int = None,
+                   caching: bool = True) -> Iterator[List[LayoutLine]]:
+        page_numbers = range(first_page, last_page) if last_page is not None else None
+        page_num: int = first_page
+        for page_layout in extract_pages(in_file, page_numbers=page_numbers, caching=caching,
+                                         laparams=self.laparams):
+            page_num += 1
+            yield get_page_lines(page_layout, page_num)
+
+
+class LineAggregator(PDFPageAggregator):
+    """A pdfminer device that keeps only text line records of the analysed page"""
+
+    def receive_layout(self, ltpage):
+        # Summarise lines right away, the layout tree with character objects is released
+        self.result = get_page_lines(ltpage, self.pageno - 1)
+
+    def paint_path(self, gstate, stroke, fill, evenodd, path):
+        # Lines, curves and rectangles never become part of text lines
+        return
+
+    def render_image(self, name, stream):
+        return
+
+    def render_char(self, matrix, font, fontsize, scaling, rise, cid, ncs, graphicstate):
+        if self._stack:
+            # Figure text is not grouped into lines, only the advance is needed to position next characters
+            return font.char_width(cid) * fontsize * scaling
+        return PDFPageAggregator.render_char(self, matrix, font, fontsize, scaling, rise, cid, ncs, graphicstate)
+
+    def end_figure(self, _):
+        self.cur_item = self._stack.pop()
+
+
+class LeanPdfMinerBackend(PdfMinerBackend):
+    """Layout extraction with pdfminer that skips graphics, figures and retention of character objects"""
+    name = "pdfminer_lean"
+
+    def iter_pages(self, in_file, first_page: int = 0, last_page: int = None,
+                   caching: bool = True) -> Iterator[List[LayoutLine]]:
+        page_numbers = range(first_page, last_page) if last_page is not None else None
+        resource_manager = PDFResourceManager(caching=True)
+        device = LineAggregator(resource_manager, pageno=first_page + 1, laparams=self.laparams)
+        interpreter = PDFPageInterpreter(resource_manager, device)
+        for page in PDFPage.get_pages(in_file, page_numbers, caching=caching):
+            interpreter.process_page(page)
+            yield device.get_result()
+
+
+def get_page_lines(page_layout, page_num: int) -> List[LayoutLine]:
+    page_lines = []
+    for idx, element in enumerate(page_layout):
+        if isinstance(element, LTTextContainer):
+            for text_line in element:
+                try:
+                    chars = get_text(text_line)
+                    text = ''.join(chars).translate(private_digits)
+                    page_lines.append(LayoutLine(page_num, idx, text_line.bbox, text, len(chars)))
+                except:
+                    module_logger.error("Failed to get bbox", text_line)
+    return page_lines
+
+
+def get_text(text_line) -> List[str]:
+    char_list = []
+    for char in text_line:
+        if isinstance(char, LTChar) or isinstance(char, LTAnno):
+            char_list.append(char.get_text())
+    return char_list
+
+
+layout_backends = {
+    PdfMinerBackend.name: PdfMinerBackend(),
+    LeanPdfMinerBackend.name: LeanPdfMinerBackend()
+}
@@ -1,11 +1,24 @@
-import sys
-from typing import List, Any
+from __future__ import annotations
+import io
+import json
+import time
+import signal
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Union
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from itertools import repeat, chain
+from collections import deque
+import numpy as np
 # from pdfminer.pdfdocument import PDFDocument
 # from pdfminer.pdfparser import PDFParser
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LTTextContainer, LTChar, LTAnno
-from dataclasses import dataclass
+from pdfminer.pdfpage import PDFPage
+from pdfminer.layout import LTChar, LTAnno
+from dataclasses import dataclass, field
 from dataclasses_json import dataclass_json
+from model.layout_cache import LayoutCache
+from model.layout_profile import LayoutProfile, LayoutProfileStore
+from model.pdf_backend import LayoutLine, layout_backends
 import logging
 
 module_logger = logging.getLogger('pdfParser.pdf_parser')
@@ -20,10 +33,28 @@ class ParserConfig:
     max_length: int = 300  # Maximal length of the reference or index term, to exclude article content
     min_words: int = 3     # Minimal number of words in reference or index (currently not used)
     max_words: int = 100   # Maximal number of words in reference or index (currently not used)
+    cache_dir: str = None  # Folder to cache line layout of parsed PDF files, no caching if not set
+    cache_size: int = 1 << 30  # Maximal size of the layout cache in bytes
+    workers: int = 1       # Number of processes for page-parallel layout analysis
+    pages_per_task: int = 16  # Number of consecutive pages analysed by a worker process in one go
+    probe_pages: int = 0   # Minimal number of pages to probe for layout detection, all pages are scanned if 0
+    probe_stable: int = 3  # Number of pages the probed layout must stay unchanged for
+    backend: str = "pdfminer_lean"  # Name of the layout extraction backend, see layout_backends
+    keep_skipped: bool = False  # Collect lines that do not belong to references, for method evaluation
+    page_timeout: float = None  # Maximal layout time per page in seconds, no limit if not set
+    doc_timeout: float = None   # Maximal layout time per PDF file in seconds, no limit if not set
+    partial_results: bool = True  # Split pages analysed before a timeout, otherwise the file is abandoned
+    low_memory: bool = False  # Stream layout twice instead of keeping line records of the whole file
+    profile_path: str = None  # JSON file with layout profiles of publication series, not used if not set
+    profile_pages: int = 3    # Number of pages to validate a stored layout profile on
+    part_workers: int = 1     # Number of processes parsing bibliography and index PDFs of a publication concurrently
 
 
 bib_config = ParserConfig()
 
+# Increment when line records produced by layout analysis change, cached layouts are invalidated
+LAYOUT_VERSION = 2
+
 
 @dataclass_json
 @dataclass
@@ -32,6 +63,99 @@ class SkippedText:
     text: str = None
 
 
+@dataclass_json
+@dataclass
+class LayoutReport:
+    """A class for holding layout analysis time and errors of a PDF file"""
+    file_name: str = None
+    page_times: List[float] = field(default_factory=list)  # Layout time of each analysed page in seconds
+    elapsed: float = 0     # Total layout time in seconds
+    error: str = None      # Kind of error, "page_timeout" or "doc_timeout"
+    message: str = None
+    abandoned: bool = False  # References are not extracted if the file was abandoned
+
+    @property
+    def pages_done(self) -> int:
+        return len(self.page_times)
+
+
+class LayoutTimeout(Exception):
+    """Raised when layout analysis exceeds its time budget"""
+    pass
+
+
+@contextmanager
+def time_limit(seconds: float):
+    """Interrupt the enclosed code with LayoutTimeout after the given number of seconds"""
+    # Timer signals are only delivered to the main thread, other threads rely on checks between pages
+    if not seconds or not hasattr(signal, 'SIGALRM') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        raise LayoutTimeout("Layout analysis exceeded " + str(round(seconds, 3)) + "s")
+
+    prev_handler = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, prev_handler)
+
+
+@dataclass
+class LayoutStats:
+    """A class for accumulating statistics on line offsets, page by page"""
+    # Number of lines by rounded horizontal position on even (index 0) and odd (index 1) pages, in the order of
+    # the first occurrence. Totals are kept as running counts, so layout is checked after each page at a fixed cost
+    offset_counts: List[Dict[int, int]] = field(default_factory=lambda: [{}, {}])
+    page_num: int = 0
+    count_last_dot: int = 0
+    count_dot_probes: int = 0
+
+    def add_page(self, page_lines: List[LayoutLine]):
+        self.page_num += 1
+        for line in page_lines:
+            # Probing first 500 lines:
+            #   if at least 100 of them end with a dot, we assume all lines must end with a dot.
+            if line.box_idx < 500 and self.count_last_dot <= 100:
+                self.count_dot_probes += 1
+                if line.length > 1 and line.text[-2] == '.':
+                    self.count_last_dot += 1
+        if len(page_lines) > 0:
+            offsets = np.rint([line.bbox[0] for line in page_lines]).astype(int)
+            keys, first_idx, counts = np.unique(offsets, return_index=True, return_counts=True)
+            order = np.argsort(first_idx, kind='stable')
+            offset_counts = self.offset_counts[self.page_num % 2]
+            for key, count in zip(keys[order].tolist(), counts[order].tolist()):
+                offset_counts[key] = offset_counts.get(key, 0) + count
+
+
+@dataclass
+class ReferenceText:
+    """A class for assembling reference text from consecutive lines"""
+    parts: List[str] = field(default_factory=list)
+    length: int = 0        # Number of characters as reported by layout analysis
+    tail: str = ""         # Last non-space character
+    max_length: int = None  # Text is not kept after the length is exceeded, the reference is filtered out anyway
+
+    def add_line(self, line: LayoutLine) -> ReferenceText:
+        self.length += line.length
+        if self.max_length is not None and self.length > self.max_length:
+            self.parts.clear()
+        else:
+            self.parts.append(line.text)
+        stripped = line.text.rstrip()
+        if stripped:
+            self.tail = stripped[-1]
+        return self
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.parts)
+
+
 @dataclass_json
 @dataclass
 class PdfParser:
@@ -48,90 +172,366 @@ class PdfParser:
     #     return content
 
     @classmethod
-    def parse_target_indent(cls, in_file, config=bib_config):
-        odd_offset_counter = {}
-        even_offset_counter = {}
-        # TODO use length of line in parser
-        odd_length = 0
-        even_length = 0
-        page_num: int = 0
-        count_last_dot = 0
-
-        def get_line_offset(el):
-            nonlocal odd_length, even_length
-            (x, y, w, h) = el
-            appr_x = round(x)
-            if page_num % 2 == 1:
-                odd_offset_counter[appr_x] = odd_offset_counter.get(appr_x, 0) + 1
-                if x + w > odd_length:
-                    odd_length = x + w
-            else:
-                even_offset_counter[appr_x] = even_offset_counter.get(appr_x, 0) + 1
-                if x + w > even_length:
-                    even_length = x + w
-
-        for page_layout in extract_pages(in_file):
-            page_num += 1
-            # for element in page_layout:
-            for idx, element in enumerate(page_layout):
-                if isinstance(element, LTTextContainer):
-                    for text_line in element:
-                        # Probing first 500 lines:
-                        #   if at least 100 of them end with a dot, we assume all lines must end with a dot.
-                        if idx < 500 and count_last_dot <= 100:
-                            line_chars = cls.__get_text(text_line)
-                            if line_chars[-2] == '.':
-                                count_last_dot += 1
-                        try:
-                            get_line_offset(text_line.bbox)
-                        except:
-                            module_logger.error("Failed to get bbox", text_line)
+    def parse_target_indent(cls, in_file, config=bib_config, report: LayoutReport = None, series: List[str] = None):
+        skipped: List[SkippedText] = []
+        try:
+            refs = list(cls.iter_target_indent(in_file, config, skipped if config.keep_skipped else None, report,
+                                               series))
+        except LayoutTimeout:
+            # The file is abandoned, the reason is recorded in the report
+            return [[], []]
+        return [refs, skipped]
+
+    @classmethod
+    def iter_target_indent(cls, in_file, config=bib_config, skipped: List[SkippedText] = None,
+                           report: LayoutReport = None, series: List[str] = None):
+        """Yield reference strings as soon as they are complete, skipped lines are added to the given list,
+        layout time and timeouts are recorded in the given report. Files of the same series, e.g., publisher,
+        ISSN and part type, are expected to share the layout if their page size is the same"""
+        report = report if report is not None else LayoutReport()
+        try:
+            # The first pass collects line offsets only, the second pass streams lines into references
+            two_pass = config.low_memory and config.probe_pages <= 0
+            store = LayoutProfileStore(config.profile_path) if config.profile_path and series else None
+            profile = None
+            if store is not None:
+                data = in_file.read()
+                in_file.close()
+                in_file = io.BytesIO(data)
+                profile_key = store.key(series, cls.page_size(io.BytesIO(data)))
+                profile = store.get(profile_key)
+            layout = None
+            if profile is not None:
+                pages = cls.__open_pages(in_file, config, report, lazy=True)
+                [pages, layout] = cls.__check_profile(pages, profile, config)
+                if layout is None and two_pass:
+                    # Line records are not kept, validation pages are analysed again
+                    in_file = io.BytesIO(data)
+            if layout is None:
+                if two_pass:
+                    data = in_file.read()
+                    layout = cls.__detect_layout(cls.__stream_page_lines(io.BytesIO(data), config, report), config)
+                    pages = cls.__stream_second_pass(data, config, report)
+                else:
+                    [pages, layout] = cls.__find_layout(
+                        pages if profile is not None else cls.__open_pages(in_file, config, report), config)
+                # Partial layout after a timeout does not describe the series
+                if store is not None and report.error is None and layout[0] and layout[1]:
+                    store.put(profile_key, layout)
+            [odd_starts, even_starts, count_last_dot] = layout
+            yield from cls.__iter_references(pages, odd_starts, even_starts, count_last_dot, config, skipped)
+        finally:
+            in_file.close()
+            module_logger.debug("Layout time: %.2fs, pages: %d", report.elapsed, report.pages_done)
+
+    @classmethod
+    def __open_pages(cls, in_file, config=bib_config, report: LayoutReport = None, lazy: bool = False):
+        # Layout found on the first pages lets the rest be analysed on demand, unless it is cached or parallel
+        lazy = (lazy or config.probe_pages > 0) and not config.cache_dir and config.workers <= 1
+        if config.low_memory or lazy:
+            # Pages are laid out while references are being split
+            return cls.__stream_page_lines(in_file, config, report)
+        # Layout analysis is the most expensive step, run it once and keep compact line records
+        return cls.__get_page_lines(in_file, config, report)
+
+    @classmethod
+    def __find_layout(cls, pages, config=bib_config):
+        # Returns pages to split and the detected layout
+        if config.probe_pages > 0:
+            pages = iter(pages)
+            [probed_pages, layout] = cls.__probe_layout(pages, config)
+            return [chain(probed_pages, pages), layout]
+        pages = list(pages)
+        return [pages, cls.__detect_layout(pages, config)]
+
+    @classmethod
+    def __check_profile(cls, pages, profile: LayoutProfile, config=bib_config):
+        # Returns pages to split and the stored layout if the first pages agree with it
+        pages = iter(pages)
+        stats = LayoutStats()
+        checked_pages = []
+        for page_lines in pages:
+            checked_pages.append(page_lines)
+            stats.add_page(page_lines)
+            if stats.page_num >= config.profile_pages:
+                break
+        else:
+            # All pages are analysed, the layout is known without the profile
+            return [checked_pages, cls.__get_layout(stats, config)]
+        [odd_starts, even_starts, _] = cls.__get_layout(stats, config, log=False)
+        # Trailing dot mode of the profile must agree with the share of lines ending with a dot, see __is_layout_clear
+        if profile.count_last_dot >= 100:
+            dot_mismatch = stats.count_last_dot < 0.25 * stats.count_dot_probes
+        else:
+            dot_mismatch = stats.count_dot_probes > 0 and (stats.count_last_dot >= 100 or
+                                                           stats.count_last_dot >= 0.5 * stats.count_dot_probes)
+        if [odd_starts, even_starts] != [profile.odd_starts, profile.even_starts] or dot_mismatch:
+            module_logger.debug("Layout profile does not match: %s %s", odd_starts, even_starts)
+            return [chain(checked_pages, pages), None]
+        module_logger.debug("Layout profile matched after %d pages", stats.page_num)
+        return [chain(checked_pages, pages), profile.layout]
+
+    @classmethod
+    def __stream_second_pass(cls, data: bytes, config=bib_config, report: LayoutReport = None):
+        # After a timeout only pages analysed in the first pass are split
+        last_page = report.pages_done if report.error is not None else None
+        second_report = LayoutReport(report.file_name, elapsed=report.elapsed)
+        try:
+            yield from cls.__stream_page_lines(io.BytesIO(data), config, second_report, last_page)
+        finally:
+            report.elapsed = second_report.elapsed
+            if second_report.error is not None:
+                [report.error, report.message, report.abandoned] = \
+                    [second_report.error, second_report.message, second_report.abandoned]
+
+    @classmethod
+    def page_size(cls, in_file) -> List[int]:
+        """Width and height of the first page"""
+        for page in PDFPage.get_pages(in_file, maxpages=1):
+            [x0, y0, x1, y1] = page.mediabox
+            return [round(x1 - x0), round(y1 - y0)]
+        return []
+
+    @classmethod
+    def __stream_page_lines(cls, in_file, config=bib_config, report: LayoutReport = None, last_page: int = None):
+        # Parsed PDF objects are not cached in low-memory mode
+        pages = cls.iter_page_lines(in_file, 0, last_page, config.backend, caching=not config.low_memory)
+        return cls.watch_pages(pages, config, report)
+
+    @classmethod
+    def layout_version(cls, backend: str = bib_config.backend) -> str:
+        """Key of the layout extraction settings"""
+        return json.dumps([LAYOUT_VERSION, layout_backends[backend].settings], sort_keys=True)
 
+    @classmethod
+    def __get_page_lines(cls, in_file, config=bib_config, report: LayoutReport = None):
+        if not config.cache_dir and config.workers <= 1:
+            return list(cls.watch_pages(cls.iter_page_lines(in_file, backend=config.backend), config, report))
+        data = in_file.read()
+        if not config.cache_dir:
+            return cls.__extract_page_lines(data, config, report)
+        cache = LayoutCache(config.cache_dir, config.cache_size, cls.layout_version(config.backend))
+        key = cache.key(data)
+        cached_pages = cache.get(key)
+        if cached_pages is not None:
+            module_logger.debug("Restored cached layout: %s", key)
+            return [[LayoutLine(page_num, box_idx, tuple(bbox), text, length)
+                     for (page_num, box_idx, bbox, text, length) in page] for page in cached_pages]
+        pages = cls.__extract_page_lines(data, config, report)
+        # Partial layout after a timeout is not cached
+        if report.error is None:
+            cache.put(key, [[[line.page_num, line.box_idx, line.bbox, line.text, line.length] for line in page]
+                            for page in pages])
+        return pages
+
+    @classmethod
+    def __extract_page_lines(cls, data, config=bib_config, report: LayoutReport = None):
+        if config.workers > 1:
+            num_pages = sum(1 for _ in PDFPage.get_pages(io.BytesIO(data)))
+            if num_pages > config.pages_per_task:
+                first_pages = list(range(0, num_pages, config.pages_per_task))
+                last_pages = [min(first_page + config.pages_per_task, num_pages) for first_page in first_pages]
+                module_logger.debug("Analysing %d pages in %d tasks", num_pages, len(first_pages))
+                # A page cannot take longer than the whole file, so workers never spin beyond the file budget
+                page_timeout = config.page_timeout or config.doc_timeout
+                timeout_kind = "page_timeout" if config.page_timeout else "doc_timeout"
+                pages = []
+                start = time.perf_counter()
+                executor = ProcessPoolExecutor(max_workers=config.workers)
+                try:
+                    # Page ranges are merged in page order, the result is the same as in serial mode
+                    for [range_pages, page_times, error] in executor.map(
+                            cls.extract_timed_page_range, repeat(data), first_pages, last_pages,
+                            repeat(config.backend), repeat(page_timeout), timeout=config.doc_timeout):
+                        pages.extend(range_pages)
+                        report.page_times.extend(page_times)
+                        if error is not None:
+                            cls.__stop_layout(report, config, timeout_kind, error)
+                            break
+                except FutureTimeout:
+                    cls.__stop_layout(report, config, "doc_timeout",
+                                      "Layout analysis exceeded " + str(config.doc_timeout) + "s")
+                finally:
+                    report.elapsed = time.perf_counter() - start
+                    # Do not wait for tasks that are not needed anymore
+                    executor.shutdown(wait=report.error is None, cancel_futures=True)
+                return pages
+        return list(cls.watch_pages(cls.iter_page_lines(io.BytesIO(data), backend=config.backend), config, report))
+
+    @classmethod
+    def extract_page_range(cls, data: bytes, first_page: int, last_page: int,
+                           backend: str = bib_config.backend) -> List[List[LayoutLine]]:
+        """Analyse pages from first_page (inclusive) to last_page (exclusive) of a PDF file given as bytes"""
+        return list(cls.iter_page_lines(io.BytesIO(data), first_page, last_page, backend))
+
+    @classmethod
+    def extract_timed_page_range(cls, data: bytes, first_page: int, last_page: int,
+                                 backend: str = bib_config.backend, page_timeout: float = None) -> list:
+        """Analyse a page range within the page time budget, returns line records, page times and timeout message"""
+        report = LayoutReport()
+        pages = list(cls.watch_pages(cls.iter_page_lines(io.BytesIO(data), first_page, last_page, backend),
+                                     ParserConfig(page_timeout=page_timeout), report))
+        return [pages, report.page_times, report.message]
+
+    @classmethod
+    def iter_page_lines(cls, in_file, first_page: int = 0, last_page: int = None, backend: str = bib_config.backend,
+                        caching: bool = True):
+        """Run layout analysis and yield a list of text line records per page"""
+        return layout_backends[backend].iter_pages(in_file, first_page, last_page, caching)
+
+    @classmethod
+    def watch_pages(cls, pages, config=bib_config, report: LayoutReport = None):
+        """Yield pages while recording their layout time, stop when the time budget is exceeded"""
+        report = report if report is not None else LayoutReport()
+        pages = iter(pages)
+        while True:
+            [budget, timeout_kind] = cls.__get_budget(report, config)
+            start = time.perf_counter()
+            try:
+                # Layout of a pathological page is interrupted, not only detected afterwards
+                with time_limit(budget):
+                    page_lines = next(pages)
+            except StopIteration:
+                return
+            except LayoutTimeout as e:
+                report.elapsed += time.perf_counter() - start
+                cls.__stop_layout(report, config, timeout_kind, str(e))
+                return
+            page_time = time.perf_counter() - start
+            report.page_times.append(page_time)
+            report.elapsed += page_time
+            # Budget checks for pages that could not be interrupted
+            if config.page_timeout is not None and page_time > config.page_timeout:
+                cls.__stop_layout(report, config, "page_timeout",
+                                  "Page layout took " + str(round(page_time, 3)) + "s")
+            elif config.doc_timeout is not None and report.elapsed > config.doc_timeout:
+                cls.__stop_layout(report, config, "doc_timeout",
+                                  "Layout analysis took " + str(round(report.elapsed, 3)) + "s")
+            yield page_lines
+            if report.error is not None:
+                return
+
+    @classmethod
+    def __get_budget(cls, report: LayoutReport, config=bib_config):
+        # Time left for the next page and the kind of timeout it would trigger
+        if config.doc_timeout is None:
+            return [config.page_timeout, "page_timeout"]
+        doc_left = max(config.doc_timeout - report.elapsed, 0.001)
+        if config.page_timeout is not None and config.page_timeout <= doc_left:
+            return [config.page_timeout, "page_timeout"]
+        return [doc_left, "doc_timeout"]
+
+    @classmethod
+    def __stop_layout(cls, report: LayoutReport, config=bib_config, kind: str = None, message: str = None):
+        report.error = kind
+        report.message = message
+        report.abandoned = not config.partial_results
+        module_logger.warning("Layout analysis of %s stopped after %d pages (%s): %s",
+                              report.file_name, report.pages_done, kind, message)
+        if report.abandoned:
+            raise LayoutTimeout(message)
+
+    @classmethod
+    def __detect_layout(cls, pages, config=bib_config):
+        stats = LayoutStats()
+        for page_lines in pages:
+            stats.add_page(page_lines)
+        return cls.__get_layout(stats, config)
+
+    @classmethod
+    def __probe_layout(cls, pages, config=bib_config):
+        # Stop probing as soon as the detected layout does not change for several pages
+        stats = LayoutStats()
+        probed_pages = []
+        prev_starts = None
+        count_stable = 0
+        for page_lines in pages:
+            probed_pages.append(page_lines)
+            stats.add_page(page_lines)
+            if stats.page_num < config.probe_pages:
+                continue
+            [odd_starts, even_starts, count_last_dot] = cls.__get_layout(stats, config, log=False)
+            count_stable = count_stable + 1 if [odd_starts, even_starts] == prev_starts else 0
+            prev_starts = [odd_starts, even_starts]
+            if count_stable >= config.probe_stable and cls.__is_layout_clear(odd_starts, even_starts, stats):
+                module_logger.debug("Layout detected after probing %d pages", stats.page_num)
+                break
+        # If the layout looks ambiguous, all pages are scanned
+        return [probed_pages, cls.__get_layout(stats, config)]
+
+    @classmethod
+    def __is_layout_clear(cls, odd_starts, even_starts, stats):
+        if len(odd_starts) != len(even_starts) or len(odd_starts) == 0 or len(odd_starts) > 2:
+            return False
+        # Trailing dot mode is clear if enough lines end with a dot or almost none of them does
+        return stats.count_last_dot >= 100 or stats.count_last_dot < 0.25 * stats.count_dot_probes
+
+    @classmethod
+    def __get_layout(cls, stats, config=bib_config, log: bool = True):
         # Remove occasional lines - title, page numbers - anything that occurs just a few times per page
-        odd_starts = cls.__get_offset_counter(odd_offset_counter, page_num, config)
-        even_starts = cls.__get_offset_counter(even_offset_counter, page_num, config)
+        odd_starts = cls.__get_offset_counter(stats.offset_counts[1], stats.page_num, config, log)
+        even_starts = cls.__get_offset_counter(stats.offset_counts[0], stats.page_num, config, log)
 
-        if len(odd_starts) > 2 or len(even_starts) > 2:
+        if log and (len(odd_starts) > 2 or len(even_starts) > 2):
             module_logger.warning("\tWarning: multi-column or unusual format")
             module_logger.warning("\t\todd starts: %s", ','.join([str(num) for num in odd_starts]))
             module_logger.warning("\t\teven starts: %s", ','.join([str(num) for num in even_starts]))
+        return [odd_starts, even_starts, stats.count_last_dot]
 
+    @classmethod
+    def __iter_references(cls, pages, odd_starts, even_starts, count_last_dot, config=bib_config, skipped=None):
         page_num = 0
-        items: List[List[Any]] = []
-        skipped: List[SkippedText] = []
-        incomplete = []
+        # References that may still get continuation lines, by their position in the output
+        open_items: Dict[int, Union[ReferenceText, str, None]] = {}
+        num_items = 0
+        next_item = 0
+        incomplete = deque()
 
-        def split_reference(line_chars, appr_x, curr_ref_chars, base):
-            curr_stripped = cls.__convert_to_str(curr_ref_chars).strip()
-            try:
-                new_ref = appr_x == base and len(curr_stripped) > 0
+        def new_item():
+            return ReferenceText(max_length=config.max_length)
+
+        def finish_item(item):
+            return item.text.strip() if config.min_length <= item.length <= config.max_length else None
+
+        def add_item(item):
+            nonlocal num_items
+            # Items that get no more lines keep only the filtered text until they are yielded
+            incomplete_item = len(incomplete) > 0 and incomplete[-1] == num_items
+            open_items[num_items] = item if incomplete_item else finish_item(item)
+            num_items += 1
+
+        def pop_finished(end):
+            nonlocal next_item
+            while next_item < end:
+                item = open_items.pop(next_item)
+                next_item += 1
+                if isinstance(item, ReferenceText):
+                    item = finish_item(item)
+                if item is not None:
+                    yield item
+
+        def split_reference(line, appr_x, curr_ref, base):
+            new_ref = appr_x == base and len(curr_ref.tail) > 0
+            if new_ref:
                 # A reference should not end with , or -
-                if new_ref:
-                    if count_last_dot >= 100:
-                        # Line must end with a dot but it does not
-                        if not curr_stripped.endswith('.'):
-                            incomplete.append(len(items))
-                    else:
-                        # Line looks unfinished
-                        if curr_stripped.endswith(',') or curr_stripped.endswith('–'):
-                            # module_logger.debug("Reference can't end like this: %s ", curr_stripped[-1])
-                            incomplete.append(len(items))
-                if new_ref:
-                    items.append(curr_ref_chars)
-                    return True  # My parser to decode string
+                if count_last_dot >= 100:
+                    # Line must end with a dot but it does not
+                    if curr_ref.tail != '.':
+                        incomplete.append(num_items)
+                else:
+                    # Line looks unfinished
+                    if curr_ref.tail == ',' or curr_ref.tail == '–':
+                        incomplete.append(num_items)
+                add_item(curr_ref)
+                return True
+            if base <= appr_x < base + config.indent:
+                if len(incomplete) > 0:
+                    open_items[incomplete.popleft()].add_line(line)
                 else:
-                    if base <= appr_x < base + config.indent:
-                        if len(incomplete) > 0:
-                            idx = incomplete.pop(0)
-                            items[idx].extend(line_chars)
-                        else:
-                            curr_ref_chars.extend(line_chars)  # My parser to decode string
-                    # Record skipped text for method evaluation
-                    else:
-                        skipped.append(SkippedText(len(items), cls.__convert_to_str(line_chars)))
-            except:
-                module_logger.warning("Failed to parse index text: ", curr_stripped)
-                module_logger.warning(sys.exc_info()[0])
+                    curr_ref.add_line(line)
+            # Record skipped text for method evaluation
+            elif skipped is not None:
+                skipped.append(SkippedText(num_items, line.text))
             return False
 
         # TODO odd_starts and even_starts should have the same number of columns, trim otherwise
@@ -139,65 +539,32 @@ class PdfParser:
             module_logger.warning("Layout differs for odd and even pages!")
 
         n = min(len(odd_starts), len(even_starts))
-        col_curr = []
-        for i in range(n):
-            col_curr.append([])
-        for page_layout in extract_pages(in_file):
+        col_curr = [new_item() for i in range(n)]
+        for page_lines in pages:
             page_num += 1
             starts = odd_starts if page_num % 2 == 1 else even_starts
-            for element in page_layout:
-                if isinstance(element, LTTextContainer):
-                    for text_line in element:
-                        try:
-                            (x, y, w, h) = text_line.bbox
-                            appr_x = round(x)
-                            col_num = 0
-                            for start in starts:
-                                if appr_x >= start + config.indent:
-                                    col_num += 1
-                            line_chars = cls.__get_text(text_line)
-                            try:
-                                if col_num < n and col_num < len(col_curr):
-                                    is_ref_added = split_reference(line_chars, appr_x, col_curr[col_num], starts[col_num])
-                                    if is_ref_added:
-                                        col_curr[col_num] = line_chars
-                                else:
-                                    skipped.append(SkippedText(len(items), cls.__convert_to_str(line_chars)))
-                            except:
-                                module_logger.error("Failed to process line", cls.__convert_to_str(line_chars))
-                        except:
-                             module_logger.error("Failed to get bbox", text_line)
-                else:
-                    pass
-                    # module_logger.warning("Non-text element: " + str(type(element)))
+            if len(page_lines) == 0:
+                continue
+            # Starts are increasing, a line belongs to the column of the last start it is indented from
+            appr_xs = np.rint([line.bbox[0] for line in page_lines]).astype(int)
+            col_nums = np.searchsorted(np.array(starts, dtype=int) + config.indent, appr_xs, side='right')
+            for line, appr_x, col_num in zip(page_lines, appr_xs.tolist(), col_nums.tolist()):
+                try:
+                    if col_num < n:
+                        if split_reference(line, appr_x, col_curr[col_num], starts[col_num]):
+                            col_curr[col_num] = new_item().add_line(line)
+                    elif skipped is not None:
+                        skipped.append(SkippedText(num_items, line.text))
+                except:
+                    module_logger.error("Failed to process line", line.text)
+                # Items waiting for a continuation line and all items after them stay open to preserve the order
+                end = num_items if len(incomplete) == 0 else incomplete[0]
+                if next_item < end:
+                    yield from pop_finished(end)
         for curr in col_curr:
-            if len(curr) > 0:
-                items.append(curr)
-        items = [item for item in items if config.min_length <= len(item) <= config.max_length]
-        refs = []
-        for item in items:
-            refs.append(cls.__convert_to_str(item).strip())
-        in_file.close()
-        return [refs, skipped]
-
-    @classmethod
-    def __convert_to_str(cls, item):
-        def convert(char):
-            if len(char) == 1:
-                num = ord(char)
-                if 63043 <= num <= 63052:
-                    return str(num - 63043)
-            return char
-        decoded_item = [convert(char) for char in item]
-        return ''.join(decoded_item)
-
-    @classmethod
-    def __get_text(cls, text_line):
-        char_list = []
-        for char in text_line:
-            if isinstance(char, LTChar) or isinstance(char, LTAnno):
-                char_list.append(char.get_text())
-        return char_list
+            if curr.length > 0:
+                add_item(curr)
+        yield from pop_finished(num_items)
 
     @classmethod
     def __get_bold_text_idx(cls, text_line):
@@ -209,13 +576,13 @@ class PdfParser:
         return bold_idx
 
     @classmethod
-    def __get_offset_counter(cls, offset_counter, page_num, config):
+    def __get_offset_counter(cls, offset_counts: Dict[int, int], page_num, config, log: bool = True):
+        # Frequent offsets in the order of their first occurrence
+        keys = [key for key, count in offset_counts.items() if count > config.noise * page_num]
         starts = []
-        offset_counter = {k: v for k, v in offset_counter.items() if v > config.noise * page_num}
-        for key in offset_counter:
-            include = [el for el in starts if key > el + config.indent]
-            if len(starts) == 0 or len(include) > len(starts) - 1:
+        for key in keys:
+            if len(starts) == 0 or key > starts[-1] + config.indent:
                 starts.append(key)
-        if len(offset_counter) == len(starts):
+        if log and len(keys) == len(starts):
             module_logger.warning("\tNo-indent formatting!")
         return starts
@@ -0,0 +1,96 @@
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Any
+import threading
+import queue
+import time
+import logging
+
+module_logger = logging.getLogger('pdfParser.pipeline')
+
+# Marks the end of the item stream in stage queues
+_END = object()
+
+
+@dataclass
+class PipelineStage:
+    """A step of the pipeline, the value returned by the function is passed to the next stage unless it is None"""
+    name: str
+    func: Callable[[Any], Any]
+    count: int = 0         # Number of processed items
+    busy_time: float = 0   # Time spent in the function, in seconds
+
+
+@dataclass
+class Pipeline:
+    """A class for running stages concurrently, each stage in its own thread, connected by bounded queues"""
+    stages: List[PipelineStage] = field(default_factory=list)
+    queue_size: int = 1    # Number of items waiting for a stage, the previous stage is blocked when the queue is full
+    source_time: float = 0  # Time spent producing items, in seconds
+
+    def run(self, items: Iterable) -> int:
+        """Pass items through all stages, returns the number of produced items. Items are produced in the calling
+        thread, e.g., to keep timer signals for PDF parsing. The first error of a stage stops the production of new
+        items, items produced before it pass the remaining stages and the error is raised after all stages finish"""
+        queues = [queue.Queue(self.queue_size) for _ in self.stages]
+        errors = []
+        failed = threading.Event()
+        threads = []
+        for idx, stage in enumerate(self.stages):
+            out_queue = queues[idx + 1] if idx + 1 < len(queues) else None
+            thread = threading.Thread(target=self.__run_stage, args=(stage, queues[idx], out_queue, failed, errors),
+                                      name="pipeline-" + stage.name, daemon=True)
+            thread.start()
+            threads.append(thread)
+        count = 0
+        items = iter(items)
+        try:
+            while not failed.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                finally:
+                    self.source_time += time.perf_counter() - start
+                count += 1
+                if len(queues) > 0:
+                    queues[0].put(item)
+        finally:
+            if len(queues) > 0:
+                queues[0].put(_END)
+            for thread in threads:
+                thread.join()
+        self.log_info()
+        if len(errors) > 0:
+            raise errors[0]
+        return count
+
+    @classmethod
+    def __run_stage(cls, stage: PipelineStage, in_queue: queue.Queue, out_queue: queue.Queue,
+                    failed: threading.Event, errors: list):
+        # Stages process their queue to the end even after a failure, items that passed previous stages are not lost
+        while True:
+            item = in_queue.get()
+            if item is _END:
+                break
+            start = time.perf_counter()
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                module_logger.error("Pipeline stage %s failed: %s", stage.name, e)
+                errors.append(e)
+                failed.set()
+                continue
+            finally:
+                stage.busy_time += time.perf_counter() - start
+            stage.count += 1
+            if out_queue is not None and result is not None:
+                out_queue.put(result)
+        if out_queue is not None:
+            out_queue.put(_END)
+
+    def log_info(self):
+        # The slowest stage bounds the throughput of the pipeline
+        module_logger.info("\tSource time: %.1fs", self.source_time)
+        for stage in self.stages:
+            module_logger.info("\tStage %s: %d items, %.1fs", stage.name, stage.count, stage.busy_time)
@@ -2,12 +2,15 @@ from __future__ import annotations
 from dataclasses import dataclass, asdict
 from dataclasses_json import dataclass_json
 from lxml import etree
+from typing import Union, Tuple
+from concurrent.futures import ProcessPoolExecutor
 import zipfile
+import io
 import json
 from model.reference_index import IndexReference
 from model.reference_bibliographic import Reference
 from model.contributor import Contributor
-from model.pdf_parser import PdfParser, SkippedText
+from model.pdf_parser import PdfParser, ParserConfig, SkippedText, LayoutReport, LayoutTimeout, bib_config
 from model.industry_identifier import IndustryIdentifier
 from model.publication_base import BasePublication
 from model.disambiguate_bibliographic import DisambiguateBibliographic
@@ -16,6 +19,30 @@ import logging
 
 module_logger = logging.getLogger('pdfParser.publication')
 
+# JATS queries are compiled once, not for every publication and element
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+BOOK_META_TAGS = ('issn', 'book-page-count', 'book-id', 'book-title', 'contrib', 'pub-date', 'publisher', 'isbn')
+find_book = etree.XPath('//book')
+find_lang = etree.XPath('//@xml:lang')
+find_text = etree.XPath('text()')
+find_all_text = etree.XPath('.//text()')
+find_year = etree.XPath('year/text()')
+find_publisher_name = etree.XPath('.//publisher-name//text()')
+find_publisher_loc = etree.XPath('.//publisher-loc//text()')
+find_titles = etree.XPath('.//title/text()')
+find_self_uri = etree.XPath('.//self-uri/@xlink:href', namespaces={"xlink": "http://www.w3.org/1999/xlink"})
+find_refs = etree.XPath('.//ref')
+find_index_titles = etree.XPath('.//index-title-group//title/text()')
+find_index_entries = etree.XPath('.//index-entry')
+# JATS files above this size are streamed unless the mode is set explicitly
+STREAM_JATS_SIZE = 16 * 1024 * 1024
+STREAM_JATS_TAGS = ('book-meta', 'book-part', 'ref-list', 'ref', 'index', 'index-title-group', 'index-entry')
+
+# Increment when parsed publications change for the same settings, cached publications are invalidated
+PARSER_VERSION = 3
+# Parser settings that change speed or memory use but not parsed publications
+PERFORMANCE_SETTINGS = ('cache_dir', 'cache_size', 'workers', 'pages_per_task', 'low_memory', 'part_workers')
+
 
 @dataclass_json
 @dataclass(unsafe_hash=True)
@@ -41,84 +68,136 @@ class Publication(BasePublication):
     index_refs_with_errors: [str] = None
     _bib_skipped: [SkippedText] = None
     _index_skipped: [[SkippedText]] = None
+    pdf_reports: [LayoutReport] = None  # Layout time and timeouts of parsed PDF files
 
     # Parsing config
     _extract_bib: bool = False
     _extract_index: bool = False
+    _parser_config: ParserConfig = None
+    _stream_jats: bool = None
+    _from_cache: bool = False  # Restored from the publication cache, not parsed
 
     @classmethod
-    def from_zip(cls, pub_zip: str, extract_bib: bool = False, extract_index: bool = False) -> Publication:
+    def from_zip(cls, pub_zip: str, extract_bib: bool = False, extract_index: bool = False,
+                 config: ParserConfig = None, pub_file=None, stream_jats: bool = None) -> Publication:
+        """Parse publication zip, if a file-like object with zip content is given, pub_zip only names it.
+        JATS files are streamed if stream_jats is set, or if it is None and the file is larger than STREAM_JATS_SIZE"""
         module_logger.info('Extracting publication from zip: ' + pub_zip)
         self = cls()
         if pub_zip is not None:
             self.zip_path = pub_zip
             self._extract_bib = extract_bib
             self._extract_index = extract_index
-            self.__parse_zip()
+            self._parser_config = config if config is not None else bib_config
+            self._stream_jats = stream_jats
+            self.__parse_zip(pub_file)
         return self
 
-    def __parse_zip(self):
+    @classmethod
+    def parser_version(cls, extract_bib: bool = False, extract_index: bool = False,
+                       config: ParserConfig = None) -> str:
+        """Key of the publication parsing settings"""
+        config = config if config is not None else bib_config
+        settings = {key: value for (key, value) in asdict(config).items() if key not in PERFORMANCE_SETTINGS}
+        return json.dumps([PARSER_VERSION, PdfParser.layout_version(config.backend), extract_bib, extract_index,
+                           settings], sort_keys=True)
+
+    @classmethod
+    def from_zip_meta(cls, pub_zip: str, pub_file=None) -> Publication:
+        """Read publication metadata from JATS book-meta only, book parts are not parsed"""
+        self = cls()
+        self.zip_path = pub_zip
+        with zipfile.ZipFile(pub_file if pub_file is not None else pub_zip, 'r') as pub_zip_file:
+            for file_name in pub_zip_file.namelist():
+                if file_name.endswith('.xml'):
+                    self.jats_file = file_name
+                    jats_root = None
+                    with pub_zip_file.open(file_name) as jats_file:
+                        try:
+                            # Stop reading as soon as book metadata is complete
+                            for event, element in etree.iterparse(jats_file, events=('end',), tag='book-meta'):
+                                jats_root = element.getroottree().getroot()
+                                break
+                        except etree.XMLSyntaxError:
+                            pass
+                    if jats_root is None:
+                        self.logger.error("Failed to parse JATS file: " + file_name)
+                    else:
+                        self.__parse_book(jats_root)
+                        # Language set after book metadata is not in the partial tree
+                        if self.lang is None:
+                            self.lang = self.__stream_lang(pub_zip_file)
+        return self
+
+    def __parse_zip(self, pub_file=None):
         self.logger.info("Parsing publication from zip: " + self.zip_path)
         if self.zip_path is None:
             return
-        pub_zip = zipfile.ZipFile(self.zip_path, 'r')
+        pub_zip = zipfile.ZipFile(pub_file if pub_file is not None else self.zip_path, 'r')
 
         for file_name in pub_zip.namelist():
             if file_name.endswith('.xml'):
                 # Publication signature will be extracted in the setter
                 self.jats_file = file_name
                 jats_file = pub_zip.open(file_name)
-                jats_root = None
-                try:
-                    jats_tree = etree.parse(jats_file)
-                    jats_root = jats_tree.getroot()
-                except:
-                    self.logger.error("Failed to parse JATS file: " + file_name)
-                if jats_root is not None:
-                    self.__parse_book(jats_root)
-                    self.__parse_references(jats_root, pub_zip)
+                stream = self._stream_jats
+                if stream is None:
+                    stream = pub_zip.getinfo(file_name).file_size > STREAM_JATS_SIZE
+                if stream:
+                    self.__stream_jats(jats_file, pub_zip)
+                else:
+                    jats_root = None
+                    try:
+                        jats_tree = etree.parse(jats_file)
+                        jats_root = jats_tree.getroot()
+                    except:
+                        self.logger.error("Failed to parse JATS file: " + file_name)
+                    if jats_root is not None:
+                        self.__parse_book(jats_root)
+                        self.__parse_references(jats_root, pub_zip)
                 jats_file.close()
         pub_zip.close()
 
     def __parse_book(self, jats_root):
         if jats_root is None:
             return
-        book = jats_root.xpath('//book')[0]
-        lang = book.xpath('//@xml:lang', namespaces={"xml": "https://www.w3.org/XML/1998/namespace"})
-        self.lang = lang[0] if len(lang) > 0 else None
+        book = jats_root if jats_root.tag == 'book' else find_book(jats_root)[0]
+        # Language is normally set on the book element, the document is searched otherwise
+        lang = book.get(XML_LANG)
+        if lang is None:
+            lang = next(iter(find_lang(book)), None)
+        self.lang = lang
+        meta = self.__collect_book_meta(book)
         self.identifiers = []
-        issn = book.xpath('.//issn')
+        issn = meta['issn']
         if len(issn) > 0:
-            pub_format = issn[0].xpath('@publication-format')
-            pub_id = issn[0].xpath("text()")
+            pub_id = find_text(issn[0])
             if len(pub_id) > 0:
-                pub_format = pub_format[0] if len(pub_format) > 0 else None
-                self.identifiers.append(IndustryIdentifier(pub_id[0], "issn", pub_format))
+                self.identifiers.append(IndustryIdentifier(pub_id[0], "issn", issn[0].get('publication-format')))
 
-        page_counts = book.xpath('.//counts/book-page-count')
+        page_counts = [element for element in meta['book-page-count'] if element.getparent().tag == 'counts']
         if len(page_counts) > 0:
-            counts = page_counts[0].xpath('@count')
-            self.page_count = int(counts[0]) if len(counts) > 0 else None
+            count = page_counts[0].get('count')
+            self.page_count = int(count) if count is not None else None
 
-        doi = book.xpath('.//book-meta/book-id[@book-id-type="doi"]')
+        doi = [element for element in meta['book-id']
+               if element.getparent().tag == 'book-meta' and element.get('book-id-type') == 'doi']
         if len(doi) > 0:
-            self.identifiers.append(IndustryIdentifier(doi[0].xpath('text()')[0], "doi", "online"))
+            self.identifiers.append(IndustryIdentifier(find_text(doi[0])[0], "doi", "online"))
         else:
-            ids = book.xpath('.//book-id')
+            ids = meta['book-id']
             if len(ids) > 0:
-                id_text = ids[0].xpath('text()')
-                id_type = ids[0].xpath('@book-id-type')
+                id_text = find_text(ids[0])
                 self.id_other = id_text[0] if len(id_text) > 0 else None
-                self.id_type = id_type[0] if len(id_type) > 0 else None
+                self.id_type = ids[0].get('book-id-type')
         # Title
-        self.title = ' '.join(book.xpath('.//book-title//text()'))
+        self.title = ' '.join(text for title in meta['book-title'] for text in find_all_text(title))
         # Authors or Editors
         # TODO How to handle chapter authors???
-        contributors = book.xpath('.//book-meta//contrib-group//contrib')
         self.editors = []
         self.authors = []
 
-        for jats_contrib in contributors:
+        for jats_contrib in meta['contrib']:
             c = Contributor.from_jats(jats_contrib)
             # This will work for "volume editor", "volume-editor", and other variations
             if "editor" in c.type.lower():
@@ -130,31 +209,139 @@ class Publication(BasePublication):
                 else:
                     self.logger.warning("Unknown contributor type: %s", c.type)
         # Year
-        year = book.xpath('.//book-meta/pub-date/year/text()')
+        year = [text for pub_date in meta['pub-date'] if pub_date.getparent().tag == 'book-meta'
+                for text in find_year(pub_date)]
         if len(year) > 0:
             # TODO check if the format is correct?
             self.year = year[0]
         # Publisher
-        publisher = book.xpath(".//publisher//publisher-name//text()")
+        publisher = [text for element in meta['publisher'] for text in find_publisher_name(element)]
         if len(publisher) > 0:
             self.publisher = publisher[0]
         # Location
-        loc = book.xpath(".//publisher//publisher-loc//text()")
+        loc = [text for element in meta['publisher'] for text in find_publisher_loc(element)]
         if len(loc) > 0:
             self.location = loc[0]
         # ISBN
-        isbn_all = book.xpath(".//isbn")
-        for isbn in isbn_all:
-            pub_format = isbn.xpath('@publication-format')
-            pub_id = isbn.xpath("text()")
+        for isbn in meta['isbn']:
+            pub_id = find_text(isbn)
             if len(pub_id) > 0:
-                pub_format = pub_format[0] if len(pub_format) > 0 else None
-                self.identifiers.append(IndustryIdentifier(pub_id[0], "isbn", pub_format))
+                self.identifiers.append(IndustryIdentifier(pub_id[0], "isbn", isbn.get('publication-format')))
 
-    def __parse_references(self, jats_root, pub_zip):
-        if jats_root is None:
+    @classmethod
+    def __collect_book_meta(cls, book) -> dict:
+        # One walk over series and book metadata, book parts and their references are not visited
+        meta = {tag: [] for tag in BOOK_META_TAGS}
+        for front in book.iterchildren('collection-meta', 'book-meta'):
+            for element in front.iter(*BOOK_META_TAGS):
+                # Contributors of the series are not contributors of the book
+                if element.tag == 'contrib' and (front.tag != 'book-meta' or not any(
+                        ancestor.tag == 'contrib-group' for ancestor in element.iterancestors())):
+                    continue
+                meta[element.tag].append(element)
+        return meta
+
+    def __stream_jats(self, jats_file, pub_zip):
+        """Parse JATS file in one pass without building the whole tree: references and index entries are created
+        as their elements close and are cleared afterwards, so memory does not grow with the size of back matter"""
+        self.__init_references()
+        book_parts = []    # Title and PDF of book parts in document order, filled in when a part closes
+        open_parts = []    # Positions of open book parts in book_parts
+        bib_list = None    # Only the first reference list is extracted, as in tree parsing
+        bib_open = False
+        index_open = False
+        index_types = None
+        count_refs = 0
+        count_entries = 0
+        # Entries may be nested, the text of an entry includes its nested entries, so an entry with nested ones
+        # is created and cleared when the outermost one closes, in document order as in tree parsing
+        entries = []
+        open_entries = 0
+        meta_done = False
+        try:
+            for event, element in etree.iterparse(jats_file, events=('start', 'end'), tag=STREAM_JATS_TAGS):
+                tag = element.tag
+                if event == 'start':
+                    if tag == 'book-part':
+                        open_parts.append(len(book_parts))
+                        book_parts.append(None)
+                    elif tag == 'ref-list' and bib_list is None:
+                        bib_list = element
+                        bib_open = True
+                    elif tag == 'index':
+                        index_open = True
+                        index_types = None
+                        count_entries = 0
+                    if (tag == 'ref' and bib_open) or (tag == 'index-entry' and index_open):
+                        entries.append(element)
+                        open_entries += 1
+                    continue
+                if tag == 'book-meta' and not meta_done:
+                    self.__parse_book(element.getroottree().getroot())
+                    meta_done = True
+                elif tag == 'ref' and bib_open:
+                    open_entries -= 1
+                    if open_entries == 0:
+                        for entry in entries:
+                            if self._extract_bib:
+                                self.__create_ref(''.join(find_all_text(entry)), count_refs)
+                            count_refs += 1
+                        entries = []
+                        self.__clear_element(element)
+                elif tag == 'ref-list' and element is bib_list:
+                    bib_open = False
+                elif tag == 'index-title-group' and index_open and index_types is None:
+                    titles = find_titles(element)
+                    if len(titles) > 0:
+                        index_types = IndexReference.get_index_types(titles[0].lower())
+                elif tag == 'index-entry' and index_open:
+                    open_entries -= 1
+                    if open_entries == 0:
+                        for entry in entries:
+                            if self._extract_index:
+                                ref_text = ''.join(find_all_text(entry))
+                                self.__create_index_ref(ref_text, count_entries, index_types or ["unknown"])
+                            count_entries += 1
+                        entries = []
+                        self.__clear_element(element)
+                elif tag == 'index':
+                    index_open = False
+                elif tag == 'book-part':
+                    book_parts[open_parts.pop()] = self.__get_book_part(element)
+                    # Nested parts are kept until the enclosing part closes, its PDF may be found in them
+                    if len(open_parts) == 0:
+                        self.__clear_element(element)
+        except etree.XMLSyntaxError as e:
+            # Entries created before the error are kept
+            self.logger.error("Failed to parse JATS file: %s, %s", self.jats_file, e)
             return
-        book_parts = jats_root.xpath('//book-part')
+        if meta_done and self.lang is None:
+            self.lang = self.__stream_lang(pub_zip)
+        self.__extract_pdf_parts(book_parts, pub_zip)
+
+    def __stream_lang(self, pub_zip) -> Union[str, None]:
+        # Elements after book metadata are not seen by the first pass, so the first xml:lang in the file is
+        # searched in a second pass for books without it
+        with pub_zip.open(self.jats_file) as jats_file:
+            for event, element in etree.iterparse(jats_file, events=('start', 'end')):
+                if event == 'start':
+                    lang = element.get(XML_LANG)
+                    if lang is not None:
+                        return lang
+                else:
+                    element.clear(keep_tail=True)
+        return None
+
+    @classmethod
+    def __clear_element(cls, element):
+        element.clear(keep_tail=True)
+        # Processed siblings are removed too, otherwise the parent keeps a growing list of empty elements
+        previous = element.getprevious()
+        while previous is not None and previous.tag == element.tag:
+            element.getparent().remove(previous)
+            previous = element.getprevious()
+
+    def __init_references(self):
         self.bib_refs = []
         self.index_refs = []
         self.index_files = []
@@ -163,84 +350,193 @@ class Publication(BasePublication):
 
         self.index_refs_with_errors = []
         self.bib_refs_with_errors = []
+        self.pdf_reports = []
+
+    def __parse_references(self, jats_root, pub_zip):
+        if jats_root is None:
+            return
+        self.__init_references()
+
+        # Book parts and back matter are collected in one walk over the document
+        elements = {tag: [] for tag in ('book-part', 'ref-list', 'index')}
+        for element in jats_root.getroottree().iter(*elements.keys()):
+            elements[element.tag].append(element)
 
         # Extract (structured) back matter from JATS
-        jats_bibs = jats_root.xpath('//ref-list')
+        jats_bibs = elements['ref-list']
         if len(jats_bibs) > 0:
             self.__extract_jats_refs(jats_bibs[0])
-        jats_idx_groups = jats_root.xpath('//index')
-        for jats_idx in jats_idx_groups:
+        for jats_idx in elements['index']:
             self.__extract_jats_idx(jats_idx)
 
         # Extract back matter from PDF
-        for book_part in book_parts:
-            titles = book_part.xpath('.//title/text()')
-            if len(titles) < 1:
-                continue
-            title = book_part.xpath('.//title/text()')[0].lower()
-            hrefs = book_part.xpath('.//self-uri/@xlink:href', namespaces={"xlink": "http://www.w3.org/1999/xlink"})
-            if len(hrefs) < 1:
-                continue
-            self.__extract_pdf_refs(title, hrefs[0], pub_zip)
-            self.__extract_pdf_idx(title, hrefs[0], pub_zip)
+        self.__extract_pdf_parts([self.__get_book_part(book_part) for book_part in elements['book-part']], pub_zip)
+
+    @classmethod
+    def __get_book_part(cls, book_part) -> Union[Tuple[str, str], None]:
+        # Title and PDF of the book part, None if either is missing
+        titles = find_titles(book_part)
+        if len(titles) < 1:
+            return None
+        hrefs = find_self_uri(book_part)
+        if len(hrefs) < 1:
+            return None
+        return titles[0].lower(), hrefs[0]
+
+    def __extract_pdf_parts(self, book_parts, pub_zip):
+        book_parts = [book_part for book_part in book_parts if book_part is not None]
+        parsed = [self.__is_parsed_part(title) for (title, href) in book_parts]
+        if self._parser_config.part_workers > 1 and sum(parsed) > 1:
+            self.__extract_pdf_parts_parallel(book_parts, parsed, pub_zip)
+            return
+        for (title, href) in book_parts:
+            self.parse_pdf_part(title, href, pub_zip)
+
+    def __is_parsed_part(self, title) -> bool:
+        return ('bibliography' in title and self._extract_bib) or ('index' in title and self._extract_index)
+
+    def __extract_pdf_parts_parallel(self, book_parts, parsed, pub_zip):
+        # Parts are parsed by copies of the publication without references and merged in book part order
+        config = self._parser_config
+        with ProcessPoolExecutor(max_workers=min(config.part_workers, sum(parsed))) as executor:
+            futures = [executor.submit(self.__copy_meta().parse_pdf_part, title, href, pub_zip.read(href))
+                       if is_parsed else None for ((title, href), is_parsed) in zip(book_parts, parsed)]
+            for ((title, href), future) in zip(book_parts, futures):
+                if future is None:
+                    self.parse_pdf_part(title, href, pub_zip)
+                else:
+                    self.__merge_part(future.result())
+
+    def __copy_meta(self) -> Publication:
+        # Metadata used in references and layout profiles, without references
+        part = Publication(zip_path=self.zip_path, publisher=self.publisher, identifiers=self.identifiers)
+        part._extract_bib = self._extract_bib
+        part._extract_index = self._extract_index
+        part._parser_config = self._parser_config
+        part.__init_references()
+        return part
+
+    def __merge_part(self, part: Publication):
+        if part.bib_file is not None:
+            self.bib_file = part.bib_file
+            if self._extract_bib:
+                self._bib_skipped = part._bib_skipped
+        for ref in part.bib_refs:
+            # Following reference is the previous one in the merged list, as in serial parsing
+            if ref.follows is not None:
+                ref.follows = self.bib_refs[ref.ref_num - 2] if ref.ref_num - 2 < len(self.bib_refs) else None
+            self.bib_refs.append(ref)
+        self.bib_refs_with_errors.extend(part.bib_refs_with_errors)
+        self.index_files.extend(part.index_files)
+        self.index_refs.extend(part.index_refs)
+        self.index_refs_with_errors.extend(part.index_refs_with_errors)
+        self._index_skipped.extend(part._index_skipped)
+        self.pdf_reports.extend(part.pdf_reports)
+
+    def parse_pdf_part(self, title: str, href: str, pub_zip) -> Publication:
+        """Parse bibliography or index PDF of a book part, pub_zip is the publication zip or the PDF content as bytes
+        in worker processes. Returns the publication with references of the part added"""
+        self.__extract_pdf_refs(title, href, pub_zip)
+        self.__extract_pdf_idx(title, href, pub_zip)
+        return self
+
+    @classmethod
+    def __open_pdf(cls, href, pub_zip):
+        return io.BytesIO(pub_zip) if isinstance(pub_zip, bytes) else pub_zip.open(href)
 
     def __extract_pdf_refs(self, title, href, pub_zip):
         if 'bibliography' in title:
             self.bib_file = href
             if self._extract_bib:
-                target_pdf = pub_zip.open(href)
-                [items, self._bib_skipped] = PdfParser.parse_target_indent(target_pdf)
-                for idx, ref_text in enumerate(items):
-                    self.__create_ref(ref_text, idx)
+                target_pdf = self.__open_pdf(href, pub_zip)
+                self._bib_skipped = [] if self._parser_config.keep_skipped else None
+                report = self.__add_pdf_report(href)
+                count_refs = [len(self.bib_refs), len(self.bib_refs_with_errors)]
+                try:
+                    # References are parsed as soon as the PDF parser completes them
+                    items = PdfParser.iter_target_indent(target_pdf, self._parser_config, self._bib_skipped, report,
+                                                         self.__get_series('bibliography'))
+                    for idx, ref_text in enumerate(items):
+                        self.__create_ref(ref_text, idx)
+                except LayoutTimeout:
+                    # Abandoned file, drop references parsed before the timeout
+                    del self.bib_refs[count_refs[0]:]
+                    del self.bib_refs_with_errors[count_refs[1]:]
 
     def __extract_pdf_idx(self, title, href, pub_zip):
         if 'index' in title:
             self.index_files.append(href)
             if self._extract_index:
-                target_pdf = pub_zip.open(href)
+                target_pdf = self.__open_pdf(href, pub_zip)
                 curr_index_types = IndexReference.get_index_types(title)
-                [items, skipped] = PdfParser.parse_target_indent(target_pdf)
+                skipped = [] if self._parser_config.keep_skipped else None
+                report = self.__add_pdf_report(href)
+                count_refs = [len(self.index_refs), len(self.index_refs_with_errors)]
+                count_items = 0
+                ref_idx = 0
+                ref_text = ""
+                try:
+                    items = PdfParser.iter_target_indent(target_pdf, self._parser_config, skipped, report,
+                                                         self.__get_series('index'))
+                    for item in items:
+                        count_items += 1
+                        text = item.replace("\n", " ").strip()
+                        # Merge lines that start from digid with previous
+                        if text[0].isdigit():
+                            ref_text += " " + text
+                        else:
+                            if ref_text:
+                                self.__create_index_ref(ref_text, ref_idx, curr_index_types)
+                                ref_idx += 1
+                            ref_text = text
+                except LayoutTimeout:
+                    # Abandoned file, drop index references parsed before the timeout
+                    del self.index_refs[count_refs[0]:]
+                    del self.index_refs_with_errors[count_refs[1]:]
                 # Save skipped text from index files for analysis
-                self.logger.info("Extracted index references: " + str(len(items)))
-                self.logger.info("Skipped lines in index file: " + str(len(skipped)))
+                self.logger.info("Extracted index references: " + str(count_items))
                 if skipped:
+                    self.logger.info("Skipped lines in index file: " + str(len(skipped)))
                     self._index_skipped.append(skipped)
-                # Merge lines that start from digid with previous
-                items = [item.replace("\n", " ").strip() for item in items]
-                ref_items = []
-                ref_text = ""
-                for text in items:
-                    if text[0].isdigit():
-                        ref_text += " " + text
-                    else:
-                        if ref_text:
-                            ref_items.append(ref_text)
-                        ref_text = text
-                for idx, ref_text in enumerate(ref_items):
-                    self.__create_index_ref(ref_text, idx, curr_index_types)
+
+    def __get_series(self, part_type: str) -> [str]:
+        # Books of a series share page layout, layout profiles are not used for books without ISSN
+        issn = [identifier.id for identifier in self.identifiers or [] if identifier.type == "issn"]
+        return [self.publisher, issn[0], part_type] if len(issn) > 0 else None
+
+    def __add_pdf_report(self, href) -> LayoutReport:
+        report = LayoutReport(file_name=href)
+        self.pdf_reports.append(report)
+        return report
+
+    @property
+    def pdf_errors(self) -> [LayoutReport]:
+        """Reports of PDF files with layout analysis stopped by a timeout"""
+        return [report for report in self.pdf_reports if report.error is not None] if self.pdf_reports else []
 
     def __extract_jats_refs(self, jats_bib):
         if self._extract_bib:
-            refs = jats_bib.xpath('.//ref')
+            refs = find_refs(jats_bib)
             for idx, ref in enumerate(refs):
-                ref_text = ''.join(ref.xpath('.//text()'))
+                ref_text = ''.join(find_all_text(ref))
                 self.__create_ref(ref_text, idx)
 
     def __extract_jats_idx(self, jats_idx):
         if self._extract_index:
-            titles = jats_idx.xpath('.//index-title-group//title/text()')
+            titles = find_index_titles(jats_idx)
             curr_index_types = ["unknown"]
             if len(titles) > 0:
                 title = titles[0].lower()
                 curr_index_types = IndexReference.get_index_types(title)
-            ref_items = jats_idx.xpath('.//index-entry')
+            ref_items = find_index_entries(jats_idx)
             for idx, idx_item in enumerate(ref_items):
-                ref_text = ''.join(idx_item.xpath('.//text()'))
+                ref_text = ''.join(find_all_text(idx_item))
                 self.__create_index_ref(ref_text, idx, curr_index_types)
 
     def __create_ref(self, ref_text, idx):
         try:
             ref = Reference(text=ref_text, ref_num=idx + 1, cited_by_doi=self.doi, cited_by_zip=self.zip_path)
+            ref.ensure_parsed()
             if ref_text.startswith('——') and idx > 0:
                 ref.follows = self.bib_refs[idx - 1]
             self.bib_refs.append(ref)
@@ -0,0 +1,44 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Union
+from model.layout_cache import LayoutCache
+from model.publication import Publication
+import gzip
+import pickle
+import logging
+
+module_logger = logging.getLogger('pdfParser.publication_cache')
+
+
+@dataclass
+class PublicationCache(LayoutCache):
+    """A class for storing parsed publications on disk, addressed by the hash of the publication zip content"""
+    cache_dir: str = "publication_cache"
+    suffix = ".pickle.gz"
+
+    @classmethod
+    def load(cls, file_path: str) -> Any:
+        with gzip.open(file_path, 'rb') as f:
+            return pickle.load(f)
+
+    @classmethod
+    def dump(cls, value: Any, file_path: str):
+        with gzip.open(file_path, 'wb', compresslevel=1) as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def get(self, key: str, pub_zip_path: str = None) -> Union[Publication, None]:
+        """Restore publication with its references, paths are updated if the zip is found at another location"""
+        pub = super().get(key)
+        if pub is None:
+            return None
+        if pub_zip_path is not None and pub.zip_path != pub_zip_path:
+            pub.zip_path = pub_zip_path
+            for ref in (pub.bib_refs or []) + (pub.index_refs or []):
+                ref.cited_by_zip = pub_zip_path
+        return pub
+
+    def put(self, key: str, pub: Publication):
+        # References cut by a timeout are parsed again next time
+        if pub.pdf_errors:
+            return
+        super().put(key, pub)
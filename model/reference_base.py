@@ -6,11 +6,29 @@ import uuid
 import logging
 
 
+class ParsedField:
+    """A field of a reference set by parsing its text. While parsing is pending, the field is left out of the
+    instance dictionary, so that reading it parses the text. Parsed values are plain instance attributes"""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        owner._parsed_fields = owner._parsed_fields + (name,)
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            # Default value of the dataclass field
+            return None
+        obj.ensure_parsed()
+        # Fields not set by parsing keep the default
+        return obj.__dict__.get(self.name)
+
+
 @dataclass_json
 @dataclass
 class BaseReference(object):
     """A class for holding information about an abstract reference (e.g., bibliographic or index)"""
     __metaclass__ = abc.ABCMeta
+    _parsed_fields = ()  # Names of fields set by parsing, see ParsedField
     text: str = None
     ref_num: int = 0
     cited_by_doi: str = None
@@ -22,13 +40,47 @@ class BaseReference(object):
             self.UUID = str(uuid.uuid4())
         self.logger = logging.getLogger('pdfParser.reference.' + self.__class__.__name__)
         # self.logger.debug('Created an instance of %s for %s ', self.__class__.__name__, self.UUID)
-        self.parse()
+        # Text is normalized now, even if parsing is deferred, as it is serialized as is
+        if self.text:
+            self.normalize_text()
+        # References restored with parsed values, or created without text as in deserialize, are not parsed, so
+        # that stored values are kept
+        if self.text and all(self.__dict__.get(name) is None for name in self._parsed_fields):
+            self.defer_parse()
 
     @abc.abstractmethod
     def parse(self):
         """Parse here reference text"""
         pass
 
+    def normalize_text(self):
+        """Normalize here reference text, e.g., replace characters that break Neo4j operations"""
+        pass
+
+    def defer_parse(self):
+        """Parse the text on first access to a parsed field"""
+        for name in self._parsed_fields:
+            self.__dict__.pop(name, None)
+        self._parse_pending = True
+
+    def ensure_parsed(self):
+        """Parse the text now unless it is already parsed, parsing errors are raised"""
+        if self.__dict__.get("_parse_pending"):
+            self._parse_pending = False
+            self.parse()
+
+    @classmethod
+    def parse_all(cls, refs: [BaseReference]) -> [BaseReference]:
+        """Parse references eagerly, returns references that failed to parse"""
+        failed = []
+        for ref in refs:
+            try:
+                ref.ensure_parsed()
+            except Exception as e:
+                ref.logger.error("Failed to parse reference %s: %s", ref.text, e)
+                failed.append(ref)
+        return failed
+
     @property
     def props(self) -> dict:
         return {
@@ -1,75 +1,132 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from dataclasses_json import dataclass_json
+from typing import Union
 import re
 from pyparsing import (Word, Char, Literal, OneOrMore, oneOf, restOfLine, pyparsing_unicode as ppu,
-                       ParseException, Optional, Regex, CaselessKeyword, Combine)
+                       ParseException, Optional, Regex, CaselessKeyword, Combine, ParserElement)
 from model.publication_external import ExternalPublication
-from model.reference_base import BaseReference
+from model.reference_base import BaseReference, ParsedField
+
+YEAR_OR_RANGE = r"\d{4}[a-z]?([,–,-]\d{4})?"
+INTL_ALPHAS = ppu.Latin1.alphas + ppu.LatinA.alphas + ppu.LatinB.alphas
+year_pattern = re.compile(YEAR_OR_RANGE)
+quoted_pattern = re.compile(r'“(.*?)”')
+title_separators = re.compile('[;,.()]')
+
+
+def citation_grammar() -> ParserElement:
+    """Grammar of a reference that starts with authors and year, the rest of the text is the title"""
+    dot = Literal(".")
+    comma = Literal(",")
+    family_name = Word(INTL_ALPHAS+'-', min=2)
+    init_name = Char(INTL_ALPHAS) + dot + Optional('-' + Char(INTL_ALPHAS) + dot)
+    # family_name.setName('LastName').setDebug()
+    same = Word('—') + dot.suppress()
+    eds = Optional('(') + (CaselessKeyword("ed") | CaselessKeyword("eds")) + Optional(dot) + Optional(comma) + Optional(')')
+    year = Regex(YEAR_OR_RANGE) + Optional(dot | comma).suppress()
+    author = family_name("LastName") + comma + OneOrMore(init_name("FirstName"))
+    author_list = Combine((author | same) + Optional(eds).suppress())
+    return author_list('author') + year('year') + restOfLine('title')
+
+
+# Building the grammar takes longer than parsing a reference, it is built once and shared by all references.
+# Packrat parsing is not enabled: the grammar hardly backtracks and memoization makes parsing slower
+citation = citation_grammar()
+
+# The grammar without editor marks as a regex: matches exactly where the grammar does and yields the same author, year
+# and title. Whitespace is not skipped within authors, but before them, the year and the dot or comma after it
+_alpha = "[" + re.escape(INTL_ALPHAS) + "]"
+_initial = _alpha + r"\." + "(?:-" + _alpha + r"\.)?"
+citation_pattern = re.compile(r"[ \t\n\r]*(?:(?P<author>[" + re.escape(INTL_ALPHAS) + r"-]{2,},(?:" + _initial + r")+)"
+                              r"|(?P<same>—+)\.)[ \t\n\r]*(?P<year>" + YEAR_OR_RANGE.replace("(", "(?:") + r")"
+                              r"(?:[ \t\n\r]*[.,])?(?P<title>.*)")
+# Texts the grammar can possibly match, others go straight to the heuristic
+citation_start = re.compile(r"[ \t\n\r]*(?:[" + re.escape(INTL_ALPHAS) + r"-]{2,}," + _alpha + r"\.|—+\.)")
+
+# Number of references parsed by each tier of Reference.parse
+parse_hits = {"regex": 0, "grammar": 0, "heuristic": 0}
 
 
 @dataclass_json
 @dataclass
 class Reference(BaseReference):
     """A class for holding information about a bibliographic reference"""
-    author: str = None
-    title: str = None
-    year: str = None
+    author: str = ParsedField()
+    title: str = ParsedField()
+    year: str = ParsedField()
     refers_to: [ExternalPublication] = None
     follows: Reference = None
 
+    def normalize_text(self):
+        self.text = self.text.replace("\n", " ").replace('"', '”')
+
     def parse(self):
         if not self.text:
             return
-        self.text = self.text.replace("\n", " ").replace('"', '”')
-        dot = Literal(".")
-        comma = Literal(",")
-        intl_alphas = ppu.Latin1.alphas + ppu.LatinA.alphas + ppu.LatinB.alphas
-        family_name = Word(intl_alphas+'-', min=2)
-        init_name = Char(intl_alphas) + dot + Optional('-' + Char(intl_alphas) + dot)
-        # family_name.setName('LastName').setDebug()
-        same = Word('—') + dot.suppress()
-        eds = Optional('(') + (CaselessKeyword("ed") | CaselessKeyword("eds")) + Optional(dot) + Optional(comma) + Optional(')')
-        year_or_range = r"\d{4}[a-z]?([,–,-]\d{4})?"
-        year = Regex(year_or_range) + Optional(dot | comma).suppress()
-        author = family_name("LastName") + comma + OneOrMore(init_name("FirstName"))
-        author_list = Combine((author | same) + Optional(eds).suppress())
-        citation = author_list('author') + year('year') + restOfLine('title')
+        self.normalize_text()
+        # Parsed values are kept in locals and set once at the end
+        text = self.text
+        author, title, year = self.author, self.title, self.year
         year_anywhere = None
         try:
-            year_anywhere = re.search(year_or_range, self.text).group(0)
+            year_anywhere = year_pattern.search(text).group(0)
         except AttributeError:
             pass
-        try:
-            res = citation.parseString(self.text)
-            self.author = res.author
-            if res.year:
-                self.year = res.year[0]
-            self.title = res.title
-            part = re.search(r'“(.*?)”', self.title)
+        # Tiers: the regex for common shapes, the grammar for editor marks, the heuristic for anything else
+        parsed = self.__parse_citation(text) or self.__parse_grammar(text)
+        if parsed:
+            author, parsed_year, title = parsed
+            year = parsed_year or year
+            part = quoted_pattern.search(title)
             if part:
-                self.title = part.group(1)
+                title = part.group(1)
             else:
-                parts = self.title.split('.')
-                self.title = parts[0]
-        except ParseException:
-            if len(self.text) > 10:
-                text_to_parse = self.text.replace(year_anywhere, "") if year_anywhere is not None else self.text
+                parts = title.split('.')
+                title = parts[0]
+        else:
+            if len(text) > 10:
+                parse_hits["heuristic"] += 1
+                text_to_parse = text.replace(year_anywhere, "") if year_anywhere is not None else text
                 # If found, use the text in quotes as title
-                part = re.search(r'“(.*?)”', text_to_parse)
+                part = quoted_pattern.search(text_to_parse)
                 if part:
-                    self.title = part.group(1).replace(".", "")
+                    title = part.group(1).replace(".", "")
                 else:
                     # If not found, use the longest part as title
-                    parts = re.split('[;,.()]', text_to_parse)
-                    self.title = max(parts, key=len)
+                    parts = title_separators.split(text_to_parse)
+                    title = max(parts, key=len)
                 # Use anything before title as author string
                 text_to_parse = text_to_parse.replace("“", "")
-                self.author = text_to_parse.partition(self.title)[0].strip()
-        if self.year is None and year_anywhere:
-            self.year = year_anywhere
+                author = text_to_parse.partition(title)[0].strip()
+        if year is None and year_anywhere:
+            year = year_anywhere
+        self.author = author
+        self.year = year
         # replacing " as it breaks Neo4J operations
-        self.title = self.title.strip().replace("\"","'")
+        self.title = title.strip().replace("\"","'")
+
+    @classmethod
+    def __parse_citation(cls, text: str) -> Union[tuple, None]:
+        # pyparsing expands tabs before parsing
+        match = citation_pattern.match(text.expandtabs())
+        if match is None:
+            return None
+        parse_hits["regex"] += 1
+        return match.group("author") or match.group("same"), match.group("year"), match.group("title")
+
+    @classmethod
+    def __parse_grammar(cls, text: str) -> Union[tuple, None]:
+        if not citation_start.match(text):
+            return None
+        try:
+            res = citation.parseString(text)
+        except ParseException:
+            return None
+        parse_hits["grammar"] += 1
+        # Named family and given names make the combined author string a nested result
+        author = res.author if isinstance(res.author, str) else res.author[0]
+        return author, res.year[0] if res.year else None, res.title
 
     @property
     def derived_author(self) -> str:
@@ -1,14 +1,117 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from pyparsing import (Word, Literal, Group, ZeroOrMore, OneOrMore, oneOf, restOfLine, delimitedList,
-                       pyparsing_unicode as ppu, ParseException, Optional, CaselessKeyword)
+                       pyparsing_unicode as ppu, ParseException, Optional, CaselessKeyword, ParserElement)
 from dataclasses_json import dataclass_json
-from model.reference_base import BaseReference
+from model.reference_base import BaseReference, ParsedField
 from model.index_external import ExternalIndex
 import uuid
-from typing import List
+from typing import List, Union
 import re
 
+INDEX_ALPHAS = ppu.Latin1.alphas + ppu.LatinA.alphas + ppu.LatinB.alphas + ppu.Greek.alphas + "\"'.’-—:“”‘’&()/«»?"
+OCCURRENCE_CHARS = ppu.Latin1.nums + 'n–'
+
+
+# @Examples:
+#   locorum: Adespota elegiaca (IEG)  23 206
+#     Aeschines 2.157 291
+def pattern1_grammar() -> ParserElement:
+    occurrences = delimitedList(Word(ppu.Latin1.nums), delim=",")
+    locus_fragment = Word(ppu.Latin1.nums + ".–=") + Optional(oneOf("ff."))
+    locus = locus_fragment + Optional('/' + locus_fragment)
+    label_chars = Word(INDEX_ALPHAS + ',;')
+    label = OneOrMore(label_chars.setParseAction(''.join))
+    return Optional(label("label")) + Optional(locus("locus").setParseAction(''.join) +
+                                               occurrences('occurrences') + restOfLine("rest"))
+
+
+# @Examples:
+#   rerum: Adonis (Plato Comicus), 160, 161, 207
+#   nominum: Antioch  10; 24; 79; 83; 85; 89–92;  105–107; 114–116; 118; 147–149; 152;  154–156; 173; 231
+def pattern2_grammar() -> ParserElement:
+    occurrences_chars = Word(OCCURRENCE_CHARS) + Optional(oneOf("f."))
+    occurrences = OneOrMore(occurrences_chars + Optional(oneOf(", ;")).suppress())
+    label_chars = Word(INDEX_ALPHAS + ',;')
+    label = OneOrMore(label_chars.setParseAction(''.join))
+    # TODO generalize: after 'see' or 'see also' other index references with occurrences can appear
+    alias = CaselessKeyword("see") + Optional(CaselessKeyword("also")) + delimitedList(Word(INDEX_ALPHAS),
+                                                                                       delim=oneOf(", ;"))
+    # label.setName("label").setDebug()
+    return label("label") + Optional(occurrences("occurrences")) + Optional(alias("alias")) + restOfLine('rest')
+
+
+# This is a patten for the inline style of indices, e.g., "Hom. Il. 1,124-125", see __parse_locorum_inline
+def locorum_inline_grammar() -> ParserElement:
+    intl_alphas = ppu.Latin1.alphas
+    intl_nums = ppu.Latin1.nums
+    label = ZeroOrMore(Word(intl_alphas + ".")) + Optional(Literal(',').suppress())
+    range_sep = Literal(',') | Literal('.')
+    level = Optional(Word(intl_nums) + range_sep.suppress())
+    end = Literal('-').suppress() + level + Word(intl_nums) | 's.'
+    start = level + Word(intl_nums)
+    locus = start("start") + Optional(end("end"))
+    return delimitedList(Group(label("label") + locus("locus")), delim=';')
+
+
+# Grammars with large Unicode character sets take longer to build than to parse an index entry, they are built once
+pattern1 = pattern1_grammar()
+pattern2 = pattern2_grammar()
+locorum_inline = locorum_inline_grammar()
+
+# Tokens of pattern 2 for the scanner, see scan_pattern2
+label_word = re.compile('[' + re.escape(INDEX_ALPHAS + ',;') + ']+')
+occurrence_word = re.compile('[' + re.escape(OCCURRENCE_CHARS) + ']+')
+WHITESPACE = ParserElement.DEFAULT_WHITE_CHARS
+
+
+@dataclass
+class ScannedIndex:
+    """A class for holding pattern 2 tokens found by the scanner, named as in pattern 2 parse results"""
+    label: List[str]
+    occurrences: Union[List[str], str]
+    alias: str
+    rest: str
+    locus: str = ""  # Not in pattern 2, read by the parsing loop shared with pattern 1
+
+
+def skip_whitespace(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos] in WHITESPACE:
+        pos += 1
+    return pos
+
+
+def scan_pattern2(text: str) -> Union[ScannedIndex, None]:
+    """Match index entry with pattern 2 without pyparsing, the result is the same as with the grammar.
+    Returns None for entries the scanner does not handle, i.e., entries with aliases or not matching the pattern"""
+    # Whitespace is skipped as pyparsing does: before every token, including optional tokens that do not match
+    text = text.expandtabs()
+    label = []
+    pos = 0
+    match = label_word.match(text, skip_whitespace(text, pos))
+    while match:
+        label.append(match.group())
+        pos = match.end()
+        match = label_word.match(text, skip_whitespace(text, pos))
+    if len(label) == 0:
+        return None
+    occurrences = []
+    match = occurrence_word.match(text, skip_whitespace(text, pos))
+    while match:
+        occurrences.append(match.group())
+        pos = skip_whitespace(text, match.end())
+        if text.startswith("f.", pos):
+            occurrences.append("f.")
+            pos = skip_whitespace(text, pos + 2)
+        if pos < len(text) and text[pos] in ",;":
+            pos += 1
+        match = occurrence_word.match(text, skip_whitespace(text, pos))
+    pos = skip_whitespace(text, pos)
+    rest = text[pos:]
+    if rest[:3].upper() == "SEE" or "\n" in rest:
+        return None
+    return ScannedIndex(label, occurrences if len(occurrences) > 0 else "", "", rest)
+
 
 @dataclass_json
 @dataclass
@@ -58,7 +161,7 @@ class IndexReferencePart:
 @dataclass
 class IndexReference(BaseReference):
     """A class for holding information about an index"""
-    refs: [IndexReferencePart] = None
+    refs: [IndexReferencePart] = ParsedField()
     types: [str] = None
     refers_to: [ExternalIndex] = None
     # An argument to distinguish between parsing of index references in text vs index files
@@ -110,19 +213,22 @@ class IndexReference(BaseReference):
             del props["types"]
         for key in props.keys():
             setattr(self, key, props[key])
-        # Restore index parts
-        self.parse()
+        # Index parts are not stored, they are restored from the text on first access
+        self.defer_parse()
         return self
 
-    def parse(self):
-        if not self.text:
-            return
+    def normalize_text(self):
         self.text = self.text.replace("\n", " ")
         # TODO Can parsing benefit from special spacing?
         self.text = self.text.replace(" ", " ")
         self.text = self.text.replace(" ", " ")
         # replacing " as it breaks Neo4J operations
         self.text = self.text.replace("\"","'")
+
+    def parse(self):
+        if not self.text:
+            return
+        self.normalize_text()
         # self.logger.debug("Parsing index text as %s: %s", ' or '.join(self.types), self.text)
         if len(self.text) < 5:
             self.logger.warning("Index text is too short: " + self.text)
@@ -168,7 +274,7 @@ class IndexReference(BaseReference):
     def __parse_as_nominum_ancient(self):
         try:
             ref = self.__parse_pattern2(self.text)
-            idx_ref = IndexReferencePart(label=" ".join(ref.label).strip(), occurrences=ref.occurrences, note=ref.rest)
+            idx_ref = IndexReferencePart(label=" ".join(ref.label).strip(), occurrences=list(ref.occurrences), note=ref.rest)
             self.refs.append(idx_ref)
         except ParseException:
             self.logger.error("Failed to parse as index nominum (ancient): " + self.text)
@@ -176,7 +282,7 @@ class IndexReference(BaseReference):
     def __parse_as_nominum_modern(self):
         try:
             ref = self.__parse_pattern2(self.text)
-            idx_ref = IndexReferencePart(label=" ".join(ref.label).strip(), occurrences=ref.occurrences, note=ref.rest)
+            idx_ref = IndexReferencePart(label=" ".join(ref.label).strip(), occurrences=list(ref.occurrences), note=ref.rest)
             self.refs.append(idx_ref)
         except ParseException:
             self.logger.error("Failed to parse as index nominum (modern): " + self.text)
@@ -207,42 +313,20 @@ class IndexReference(BaseReference):
             label = " ".join(ref.label).strip()
             if label.endswith(','):
                 label = label[:-1]
-            idx_ref = IndexReferencePart(label=label, locus=ref.locus, occurrences=ref.occurrences)
+            idx_ref = IndexReferencePart(label=label, locus=ref.locus, occurrences=list(ref.occurrences))
             self.refs.append(idx_ref)
             text = ref.rest
             the_end = True if len(text) == 0 else False
             if the_end:
                 idx_ref.note = text
 
-    # @Examples:
-    #   locorum: Adespota elegiaca (IEG)  23 206
-    #     Aeschines 2.157 291
     def __parse_pattern1(self, text: str):
-        alphas = ppu.Latin1.alphas + ppu.LatinA.alphas + ppu.LatinB.alphas + ppu.Greek.alphas + "\"'.’-—:“”‘’&()/«»?"
-        occurrences = delimitedList(Word(ppu.Latin1.nums), delim=",")
-        locus_fragment = Word(ppu.Latin1.nums + ".–=") + Optional(oneOf("ff."))
-        locus = locus_fragment + Optional('/' + locus_fragment)
-        label_chars = Word(alphas + ',;')
-        label = OneOrMore(label_chars.setParseAction(''.join))
-        index = Optional(label("label")) + Optional(locus("locus").setParseAction(''.join) +
-                                                    occurrences('occurrences') + restOfLine("rest"))
-        return index.parseString(text)
-
-    # @Examples:
-    #   rerum: Adonis (Plato Comicus), 160, 161, 207
-    #   nominum: Antioch  10; 24; 79; 83; 85; 89–92;  105–107; 114–116; 118; 147–149; 152;  154–156; 173; 231
+        return pattern1.parseString(text)
+
     def __parse_pattern2(self, text: str):
-        alphas = ppu.Latin1.alphas + ppu.LatinA.alphas + ppu.LatinB.alphas + ppu.Greek.alphas + "\"'.’-—:“”‘’&()/«»?"
-        occurrences_chars = Word(ppu.Latin1.nums + 'n–') + Optional(oneOf("f."))
-        occurrences = OneOrMore(occurrences_chars + Optional(oneOf(", ;")).suppress())
-        label_chars = Word(alphas + ',;')
-        label = OneOrMore(label_chars.setParseAction(''.join))
-        # TODO generalize: after 'see' or 'see also' other index references with occurrences can appear
-        alias = CaselessKeyword("see") + Optional(CaselessKeyword("also")) + delimitedList(Word(alphas),
-                                                                                           delim=oneOf(", ;"))
-        # label.setName("label").setDebug()
-        index = label("label") + Optional(occurrences("occurrences")) + Optional(alias("alias")) + restOfLine('rest')
-        return index.parseString(text)
+        # Most entries are matched by the scanner, the grammar is used for the rest
+        ref = scan_pattern2(text)
+        return ref if ref is not None else pattern2.parseString(text)
 
     # Inline pattern, only needed for testing
     def __parse_locorum_inline(self):
@@ -254,16 +338,7 @@ class IndexReference(BaseReference):
         #   In the example above 1,124-5 stands for from Book 1, Line 124 to Book 1, Line 125
         # 5) When the citation scope is a range, the identical hierarchical level are collapsed:
         #   1.124 - 1.125 can be written as both 1.124-125 or 1.124 s.
-        intl_alphas = ppu.Latin1.alphas
-        intl_nums = ppu.Latin1.nums
-        label = ZeroOrMore(Word(intl_alphas + ".")) + Optional(Literal(',').suppress())
-        range_sep = Literal(',') | Literal('.')
-        level = Optional(Word(intl_nums) + range_sep.suppress())
-        end = Literal('-').suppress() + level + Word(intl_nums) | 's.'
-        start = level + Word(intl_nums)
-        locus = start("start") + Optional(end("end"))
-        index = delimitedList(Group(label("label") + locus("locus")), delim=';')
-        res = index.parseString(self.text)
+        res = locorum_inline.parseString(self.text)
         for ref in res:
             locus_txt = ref.locus[0] + "." + ref.locus[1]
             if len(ref.locus) > 2:
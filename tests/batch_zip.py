@@ -0,0 +1,17 @@
+import contextlib
+import tempfile
+import zipfile
+import os
+
+
+@contextlib.contextmanager
+def temp_batch_zip(file_names: [str], entries: dict = None):
+    """Archive with publications of data_test in a temporary folder, entries are other content by name"""
+    with tempfile.TemporaryDirectory() as batch_dir:
+        zip_path = os.path.join(batch_dir, 'batch.zip')
+        with zipfile.ZipFile(zip_path, 'w') as batch_zip:
+            for (name, data) in (entries or {}).items():
+                batch_zip.writestr(name, data)
+            for file_name in file_names:
+                batch_zip.write('../data_test/' + file_name, file_name)
+        yield zip_path
@@ -0,0 +1,62 @@
+import unittest
+import zipfile
+import os
+from batch_zip import temp_batch_zip
+from model.batch import Batch
+from model.ingest_ledger import IngestLedger
+from model.log_config import config_logger
+
+
+class TestIngestLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = config_logger("test_ingest_ledger.log")
+
+    # Saved publications are skipped in the next run unless their zip changes
+    def test_resume_batch(self):
+        file_names = ['9783657782116_BITS.zip', '9789047443735_BITS.zip']
+        with temp_batch_zip(file_names) as zip_path:
+            ledger = IngestLedger(os.path.join(os.path.dirname(zip_path), 'ledger.db'))
+            self.assertEqual(file_names, ledger.pending(zip_path))
+            batch = Batch.from_zip(zip_path, extract_bib=False, ledger=ledger)
+            self.assertEqual(2, batch.pub_count)
+            # Only the first publication is saved before interruption
+            pub = batch.publications[0]
+            ledger.commit(*batch.ledger_entry(pub), pub.jats_file)
+            self.assertEqual(file_names[1:], ledger.pending(zip_path))
+            batch = Batch.from_zip(zip_path, extract_bib=False, ledger=ledger)
+            self.assertEqual(1, batch.count_skipped)
+            self.assertEqual(1, batch.pub_count)
+            self.assertTrue(batch.publications[0].zip_path.endswith(file_names[1]))
+            # Changed content is parsed again
+            with zipfile.ZipFile(zip_path, 'w') as batch_zip:
+                batch_zip.write('../data_test/' + file_names[1], file_names[0])
+            self.assertEqual([file_names[0]], ledger.pending(zip_path))
+            ledger.close()
+
+    # Records are kept per DB and follow publications found in it
+    def test_sync_with_db(self):
+        file_names = ['9783657782116_BITS.zip', '9789047443735_BITS.zip']
+        jats_files = ['9783657782116_webready_content_text.xml', '9789047443735_webready_content_text.xml']
+        with temp_batch_zip(file_names) as zip_path:
+            ledger_path = os.path.join(os.path.dirname(zip_path), 'ledger.db')
+            ledger = IngestLedger(ledger_path, "bolt://populated:7687")
+            # DB populated without the ledger
+            ledger.sync(zip_path, jats_files[:1])
+            self.assertEqual(file_names[1:], ledger.pending(zip_path))
+            # Another DB has no saved publications
+            other_ledger = IngestLedger(ledger_path, "bolt://fresh:7687")
+            self.assertEqual(file_names, other_ledger.pending(zip_path))
+            other_ledger.close()
+            # Publications missing in the DB are ingested again
+            ledger.sync(zip_path, [])
+            self.assertEqual(file_names, ledger.pending(zip_path))
+            ledger.sync(zip_path, jats_files)
+            self.assertEqual([], ledger.pending(zip_path))
+            ledger.clear()
+            self.assertEqual(file_names, ledger.pending(zip_path))
+            ledger.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,254 @@
+import unittest
+import zipfile
+import tempfile
+import time
+import os
+import subprocess
+import sys
+from multiprocessing import Pool
+from model.pdf_parser import PdfParser, ParserConfig, LayoutReport
+from model.layout_cache import LayoutCache
+from model.layout_profile import LayoutProfileStore
+from model.pdf_backend import layout_backends
+from model.log_config import config_logger
+
+
+def put_profiles(args):
+    [path, series] = args
+    store = LayoutProfileStore(path)
+    for i in range(20):
+        store.put(store.key(series, [i]), [[i], [i], 0])
+
+
+class TestPdfParser(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = config_logger("test_pdf_parser.log")
+
+    # Layout analysis runs once, line records carry page numbers and bounding boxes
+    def test_page_lines(self):
+        pub_zip = zipfile.ZipFile('../data_test/9789004382855_BITS.zip')
+        pages = list(PdfParser.iter_page_lines(pub_zip.open('9789004382855_webready_content_s021.pdf')))
+        self.assertGreaterEqual(len(pages), 1)
+        for page_num, page_lines in enumerate(pages):
+            for line in page_lines:
+                self.assertEqual(page_num + 1, line.page_num)
+                self.assertEqual(4, len(line.bbox))
+                self.assertGreaterEqual(line.length, 1)
+
+    # Split bibliography into references
+    def test_parse_target_indent(self):
+        pub_zip = zipfile.ZipFile('../data_test/9789004188846_BITS.zip')
+        [refs, skipped] = PdfParser.parse_target_indent(pub_zip.open('9789004188846_webready_content_s015.pdf'))
+        self.assertEqual(1236, len(refs))
+        self.assertEqual(0, len(skipped))
+        # Skipped lines are only collected on demand
+        [refs, skipped] = PdfParser.parse_target_indent(pub_zip.open('9789004188846_webready_content_s015.pdf'),
+                                                        ParserConfig(keep_skipped=True))
+        self.assertEqual(1236, len(refs))
+        self.assertGreaterEqual(len(skipped), 1)
+
+    # Cached layout gives the same references, old entries are evicted when the cache is full
+    def test_layout_cache(self):
+        pub_zip = zipfile.ZipFile('../data_test/9789004382855_BITS.zip')
+        file_names = ['9789004382855_webready_content_s020.pdf', '9789004382855_webready_content_s021.pdf']
+        with tempfile.TemporaryDirectory() as cache_dir:
+            config = ParserConfig(cache_dir=cache_dir, keep_skipped=True)
+            for file_name in file_names:
+                [refs, skipped] = PdfParser.parse_target_indent(pub_zip.open(file_name), ParserConfig(keep_skipped=True))
+                [refs_miss, skipped_miss] = PdfParser.parse_target_indent(pub_zip.open(file_name), config)
+                [refs_hit, skipped_hit] = PdfParser.parse_target_indent(pub_zip.open(file_name), config)
+                self.assertEqual(refs, refs_miss)
+                self.assertEqual(refs, refs_hit)
+                self.assertGreaterEqual(len(skipped), 1)
+                self.assertEqual(skipped, skipped_miss)
+                self.assertEqual(skipped, skipped_hit)
+            self.assertEqual(2, len(os.listdir(cache_dir)))
+            # Evict least recently used entries
+            cache = LayoutCache(cache_dir, max_size=1, version=PdfParser.layout_version())
+            cache.evict()
+            self.assertEqual(0, len(os.listdir(cache_dir)))
+            # Different extraction settings do not share entries
+            data = pub_zip.read(file_names[0])
+            self.assertNotEqual(cache.key(data), LayoutCache(cache_dir, version="other").key(data))
+
+    # Page-parallel layout analysis gives the same result as serial mode
+    def test_parallel_layout(self):
+        pub_zip = zipfile.ZipFile('../data_test/9789004188846_BITS.zip')
+        file_name = '9789004188846_webready_content_s016.pdf'
+        serial_pages = list(PdfParser.iter_page_lines(pub_zip.open(file_name)))
+        parallel_pages = PdfParser.extract_page_range(pub_zip.read(file_name), 5, 10)
+        self.assertEqual(serial_pages[5:10], parallel_pages)
+        [refs, skipped] = PdfParser.parse_target_indent(pub_zip.open(file_name), ParserConfig(keep_skipped=True))
+        config = ParserConfig(workers=2, pages_per_task=4, keep_skipped=True)
+        [refs_parallel, skipped_parallel] = PdfParser.parse_target_indent(pub_zip.open(file_name), config)
+        self.assertEqual(refs, refs_parallel)
+        self.assertGreaterEqual(len(skipped), 1)
+        self.assertEqual(skipped, skipped_parallel)
+
+    # References are yielded in the same order as returned by the list version
+    def test_iter_target_indent(self):
+        pub_zip = zipfile.ZipFile('../data_test/9789004188846_BITS.zip')
+        file_name = '9789004188846_webready_content_s016.pdf'
+        [refs, skipped] = PdfParser.parse_target_indent(pub_zip.open(file_name))
+        items = PdfParser.iter_target_indent(pub_zip.open(file_name))
+        self.assertEqual(refs[0], next(items))
+        self.assertEqual(refs[1:], list(items))
+
+    # Layout detected on the first pages gives the same references as the full scan
+    def test_probe_layout(self):
+        pub_zip = zipfile.ZipFile('../data_test/9789004188846_BITS.zip')
+        file_name = '9789004188846_webready_content_s015.pdf'
+        [refs, skipped] = PdfParser.parse_target_indent(pub_zip.open(file_name), ParserConfig(keep_skipped=True))
+        [refs_probed, skipped_probed] = PdfParser.parse_target_indent(pub_zip.open(file_name),
+                                                                      ParserConfig(probe_pages=4, keep_skipped=True))
+        self.assertEqual(refs, refs_probed)
+        self.assertGreaterEqual(len(skipped), 1)
+        self.assertEqual(skipped, skipped_probed)
+
+    # Layout backends produce the same line records, compare their throughput
+    def test_layout_backends(self):
+        files = {
+            '../data_test/9789004188846_BITS.zip': ['9789004188846_webready_content_s015.pdf',
+                                                    '9789004188846_webready_content_s016.pdf'],
+            '../data_test/9789004382855_BITS.zip': ['9789004382855_webready_content_s020.pdf',
+                                                    '9789004382855_webready_content_s021.pdf',
+                                                    '9789004382855_webready_content_s022.pdf']
+        }
+        elapsed = {name: 0 for name in layout_backends}
+        count_pages = 0
+        for zip_path, file_names in files.items():
+            pub_zip = zipfile.ZipFile(zip_path)
+            for file_name in file_names:
+                pages = {}
+                for name, backend in layout_backends.items():
+                    start = time.perf_counter()
+                    pages[name] = list(backend.iter_pages(pub_zip.open(file_name)))
+                    elapsed[name] += time.perf_counter() - start
+                self.assertEqual(pages["pdfminer"], pages["pdfminer_lean"])
+                count_pages += len(pages["pdfminer"])
+        for name in layout_backends:
+            print(name, count_pages, "pages,", round(count_pages / elapsed[name], 1), "pages/s")
+
+    # Layout time is recorded per page, analysis stops when the time budget is exceeded
+    def test_layout_timeout(self):
+        pub_zip = zipfile.ZipFile('../data_test/9789004188846_BITS.zip')
+        file_name = '9789004188846_webready_content_s016.pdf'
+        report = LayoutReport()
+        [refs, skipped] = PdfParser.parse_target_indent(pub_zip.open(file_name), report=report)
+        self.assertIsNone(report.error)
+        self.assertGreaterEqual(report.pages_done, 2)
+        self.assertGreater(report.elapsed, 0)
+        # Partial results from pages analysed before the timeout
+        config = ParserConfig(doc_timeout=report.elapsed / 2)
+        report = LayoutReport()
+        [refs_partial, skipped_partial] = PdfParser.parse_target_indent(pub_zip.open(file_name), config, report)
+        self.assertEqual("doc_timeout", report.error)
+        self.assertFalse(report.abandoned)
+        self.assertLessEqual(len(refs_partial), len(refs))
+        # Abandon the file
+        for config in [ParserConfig(page_timeout=0.001, partial_results=False),
+                       ParserConfig(page_timeout=0.001, partial_results=False, workers=2, pages_per_task=4)]:
+            report = LayoutReport()
+            [refs_abandoned, skipped_abandoned] = PdfParser.parse_target_indent(pub_zip.open(file_name), config,
+                                                                                report)
+            self.assertEqual("page_timeout", report.error)
+            self.assertTrue(report.abandoned)
+            self.assertEqual(0, len(refs_abandoned))
+
+    # Low-memory mode gives the same references with lower peak memory, measured in separate processes
+    def test_low_memory(self):
+        zip_path = '../data_test/9789004188846_BITS.zip'
+        file_name = '9789004188846_webready_content_s015.pdf'
+        pub_zip = zipfile.ZipFile(zip_path)
+        [refs, skipped] = PdfParser.parse_target_indent(pub_zip.open(file_name), ParserConfig(keep_skipped=True))
+        [refs_low, skipped_low] = PdfParser.parse_target_indent(pub_zip.open(file_name),
+                                                                ParserConfig(keep_skipped=True, low_memory=True))
+        self.assertEqual(refs, refs_low)
+        self.assertEqual(skipped, skipped_low)
+        # Peak memory over the interpreter with imports, on the largest file: a whole book. The peak is read from
+        # /proc, as ru_maxrss keeps the peak of the test process across exec
+        script = "import zipfile, sys; from model.pdf_parser import PdfParser, ParserConfig; " \
+                 "peak = lambda: int(next(line for line in open('/proc/self/status') if line.startswith('VmHWM')" \
+                 ").split()[1]); " \
+                 "start = peak(); " \
+                 "PdfParser.parse_target_indent(zipfile.ZipFile(sys.argv[1]).open(sys.argv[2]), " \
+                 "ParserConfig(low_memory=sys.argv[3] == 'True')); " \
+                 "print(peak() - start)"
+        env = dict(os.environ, PYTHONPATH=os.path.abspath('..'))
+        peak_rss = []
+        for low_memory in [False, True]:
+            out = subprocess.run([sys.executable, '-c', script, '../data_eval/9789004257788_BITS.zip',
+                                  '9789004257788_webready_content_text.pdf', str(low_memory)],
+                                 capture_output=True, text=True, env=env)
+            peak_rss.append(int(out.stdout))
+        self.assertLess(peak_rss[1], 0.75 * peak_rss[0])
+
+    # Layout stored for a series is reused if the first pages agree with it
+    def test_layout_profile(self):
+        pub_zip = zipfile.ZipFile('../data_test/9789004382855_BITS.zip')
+        file_name = '9789004382855_webready_content_s020.pdf'
+        series = ['Brill', 'test', 'index']
+        [refs, skipped] = PdfParser.parse_target_indent(pub_zip.open(file_name))
+        with tempfile.TemporaryDirectory() as profile_dir:
+            config = ParserConfig(profile_path=os.path.join(profile_dir, "profiles.json"))
+            store = LayoutProfileStore(config.profile_path)
+            [refs_stored, skipped_stored] = PdfParser.parse_target_indent(pub_zip.open(file_name), config,
+                                                                          series=series)
+            self.assertEqual(refs, refs_stored)
+            self.assertEqual(1, len(store.load()))
+            key = store.key(series, PdfParser.page_size(pub_zip.open(file_name)))
+            profile = store.get(key)
+            self.assertEqual(1, profile.count_files)
+            for low_memory in [False, True]:
+                [refs_profile, skipped_profile] = PdfParser.parse_target_indent(
+                    pub_zip.open(file_name), ParserConfig(profile_path=config.profile_path, low_memory=low_memory),
+                    series=series)
+                self.assertEqual(refs, refs_profile)
+            # Profile that does not match the first pages is replaced
+            store.put(key, [[10], [10], 0])
+            [refs_replaced, skipped_replaced] = PdfParser.parse_target_indent(pub_zip.open(file_name), config,
+                                                                              series=series)
+            self.assertEqual(refs, refs_replaced)
+            self.assertEqual(profile.layout, store.get(key).layout)
+
+    # Profiles stored by parallel processes are all kept
+    def test_layout_profile_concurrent(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            path = os.path.join(profile_dir, "profiles.json")
+            with Pool(4) as pool:
+                pool.map(put_profiles, [[path, ['Brill', 'test', str(i % 2)]] for i in range(8)])
+            store = LayoutProfileStore(path)
+            self.assertEqual(40, len(store.load()))
+            self.assertEqual(4, store.get(store.key(['Brill', 'test', '0'], [19])).count_files)
+
+    # Share of lines with a trailing dot on the first pages rejects a profile in the other dot mode
+    def test_layout_profile_dot_mode(self):
+        # Bibliography in dot mode and index without it
+        for (isbn, part, dot_mode) in [('9789004188846', 's015', True), ('9789004382855', 's020', False)]:
+            pub_zip = zipfile.ZipFile('../data_test/' + isbn + '_BITS.zip')
+            file_name = isbn + '_webready_content_' + part + '.pdf'
+            series = ['Brill', 'test', file_name]
+            [refs, skipped] = PdfParser.parse_target_indent(pub_zip.open(file_name))
+            with tempfile.TemporaryDirectory() as profile_dir:
+                config = ParserConfig(profile_path=os.path.join(profile_dir, "profiles.json"))
+                store = LayoutProfileStore(config.profile_path)
+                key = store.key(series, PdfParser.page_size(pub_zip.open(file_name)))
+                PdfParser.parse_target_indent(pub_zip.open(file_name), config, series=series)
+                layout = store.get(key).layout
+                self.assertEqual(dot_mode, layout[2] >= 100)
+                # Profile with the same columns in the other mode is replaced
+                store.put(key, layout[:2] + [0 if dot_mode else 101])
+                [refs_profile, skipped_profile] = PdfParser.parse_target_indent(pub_zip.open(file_name), config,
+                                                                                series=series)
+                self.assertEqual(refs, refs_profile)
+                self.assertEqual(layout, store.get(key).layout)
+                self.assertEqual(3, store.get(key).count_files)
+                # Profile in the same mode is used and not stored again
+                [refs_profile, skipped_profile] = PdfParser.parse_target_indent(pub_zip.open(file_name), config,
+                                                                                series=series)
+                self.assertEqual(refs, refs_profile)
+                self.assertEqual(3, store.get(key).count_files)
+
+if __name__ == '__main__':
+    unittest.main()
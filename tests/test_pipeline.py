@@ -0,0 +1,68 @@
+import unittest
+import threading
+import time
+from model.pipeline import Pipeline, PipelineStage
+from model.log_config import config_logger
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = config_logger("test_pipeline.log")
+
+    # Items pass all stages in order, stages run concurrently
+    def test_pipeline(self):
+        saved = []
+        # Passed only when the source and both stages wait at the same time, sequential processing breaks it
+        concurrent = threading.Barrier(3, timeout=10)
+
+        def produce():
+            for i in range(5):
+                if i == 2:
+                    concurrent.wait()
+                yield i
+
+        def double(item):
+            if item == 1:
+                concurrent.wait()
+            return 2 * item
+
+        def save(item):
+            if item == 0:
+                concurrent.wait()
+            saved.append(item)
+
+        pipeline = Pipeline([PipelineStage("double", double), PipelineStage("save", save)])
+        self.assertEqual(5, pipeline.run(produce()))
+        self.assertEqual([0, 2, 4, 6, 8], saved)
+        self.assertEqual([5, 5], [stage.count for stage in pipeline.stages])
+
+    # Error in a stage stops production of new items and is raised, produced items still pass the other stages
+    def test_pipeline_error(self):
+        produced = []
+        saved = []
+
+        def produce():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        def fail(item):
+            if item == 3:
+                raise ValueError("Failed item")
+            return item
+
+        def save(item):
+            # Slow stage, items wait in its queue when the error occurs
+            time.sleep(0.05)
+            saved.append(item)
+
+        pipeline = Pipeline([PipelineStage("fail", fail), PipelineStage("save", save)])
+        self.assertRaises(ValueError, pipeline.run, produce())
+        self.assertLess(len(produced), 100)
+        self.assertEqual([item for item in produced if item != 3], saved)
+        self.assertEqual(len(saved), pipeline.stages[1].count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,14 @@ from model.contributor import Contributor
 from model.reference_index import IndexReference
 from model.reference_bibliographic import Reference
 from model.publication import Publication
-from dataclasses import asdict
+from model.batch import Batch
+from model.pdf_parser import bib_config
+from dataclasses import asdict, replace
 import json
+import io
+import os
+import zipfile
+from batch_zip import temp_batch_zip
 
 
 class TestModel(unittest.TestCase):
@@ -32,6 +38,18 @@ class TestModel(unittest.TestCase):
         self.assertEqual(385, pub.page_count)
         self.assertEqual(True, pub.is_collection)
 
+    # Publication zip read from memory, e.g., from a batch archive, is parsed as a file on disk
+    def test_publication_from_memory(self):
+        zip_file = '../data_test/9789004188846_BITS.zip'
+        pub = Publication.from_zip(zip_file, extract_bib=True)
+        with open(zip_file, 'rb') as f:
+            pub_file = io.BytesIO(f.read())
+        pub_memory = Publication.from_zip('batch/9789004188846_BITS/9789004188846_BITS.zip', extract_bib=True,
+                                          pub_file=pub_file)
+        self.assertEqual('batch/9789004188846_BITS/9789004188846_BITS.zip', pub_memory.zip_path)
+        self.assertEqual(pub.title, pub_memory.title)
+        self.assertEqual([ref.text for ref in pub.bib_refs], [ref.text for ref in pub_memory.bib_refs])
+
 
     # Parse publication
     def test_publication_bib_parser(self):
@@ -84,6 +102,107 @@ class TestModel(unittest.TestCase):
         # Check index references
         self.assertEqual(1204, len(pub.index_refs))
 
+    # Parallel batch parsing gives publications in archive order and the same statistics as serial mode
+    def test_batch_parallel(self):
+        entries = {'broken_BITS.zip': b'not a zip', 'corrupt_BITS.zip': b'not read'}
+        with temp_batch_zip(['9789004188846_BITS.zip', '9783657782116_BITS.zip'], entries) as zip_path:
+            # Entry content does not match its CRC, reading it from the archive fails
+            with zipfile.ZipFile(zip_path) as batch_zip:
+                offset = batch_zip.getinfo('corrupt_BITS.zip').header_offset + 30 + len('corrupt_BITS.zip')
+            with open(zip_path, 'r+b') as f:
+                f.seek(offset)
+                f.write(b'N')
+            batch = Batch.from_zip(zip_path)
+            batch_parallel = Batch.from_zip(zip_path, workers=2)
+            self.assertEqual(2, batch_parallel.pub_count)
+            self.assertEqual(2, batch_parallel.errors_other)
+            self.assertEqual([batch.count_bib, batch.errors_xml, batch.errors_other],
+                             [batch_parallel.count_bib, batch_parallel.errors_xml, batch_parallel.errors_other])
+            self.assertEqual([pub.zip_path for pub in batch.publications],
+                             [pub.zip_path for pub in batch_parallel.publications])
+            self.assertEqual([len(pub.bib_refs) for pub in batch.publications],
+                             [len(pub.bib_refs) for pub in batch_parallel.publications])
+
+    # Bibliography and index PDFs parsed concurrently are merged in book part order
+    def test_publication_parts_parallel(self):
+        zip_file = '../data_test/9789004188846_BITS.zip'
+        pub = Publication.from_zip(zip_file, extract_bib=True, extract_index=True)
+        pub_parallel = Publication.from_zip(zip_file, extract_bib=True, extract_index=True,
+                                            config=replace(bib_config, part_workers=2))
+        self.assertEqual(pub.bib_file, pub_parallel.bib_file)
+        self.assertEqual(pub.index_files, pub_parallel.index_files)
+        self.assertEqual([ref.text for ref in pub.bib_refs], [ref.text for ref in pub_parallel.bib_refs])
+        self.assertEqual([ref.text for ref in pub.index_refs], [ref.text for ref in pub_parallel.index_refs])
+        self.assertEqual([pub.bib_refs_with_errors, pub.index_refs_with_errors],
+                         [pub_parallel.bib_refs_with_errors, pub_parallel.index_refs_with_errors])
+        self.assertEqual([report.file_name for report in pub.pdf_reports],
+                         [report.file_name for report in pub_parallel.pdf_reports])
+        for ref in pub_parallel.bib_refs:
+            if ref.follows is not None:
+                self.assertIs(pub_parallel.bib_refs[ref.ref_num - 2], ref.follows)
+
+    # Publications parsed with the same settings are restored from the cache in the next run
+    def test_batch_cache(self):
+        with temp_batch_zip(['9789004188846_BITS.zip', '9783657782116_BITS.zip']) as zip_path:
+            cache_dir = os.path.join(os.path.dirname(zip_path), 'cache')
+            batch = Batch.from_zip(zip_path, cache_dir=cache_dir)
+            self.assertEqual(0, batch.count_cached)
+            batch_cached = Batch.from_zip(zip_path, cache_dir=cache_dir)
+            self.assertEqual(2, batch_cached.count_cached)
+            for (pub, pub_cached) in zip(batch.publications, batch_cached.publications):
+                self.assertEqual([pub.zip_path, pub.doi, pub.title], [pub_cached.zip_path, pub_cached.doi,
+                                                                      pub_cached.title])
+                self.assertEqual([ref.text for ref in pub.bib_refs], [ref.text for ref in pub_cached.bib_refs])
+                self.assertEqual([ref.UUID for ref in pub.bib_refs], [ref.UUID for ref in pub_cached.bib_refs])
+            # Other settings give other results
+            batch_index = Batch.from_zip(zip_path, extract_index=True, cache_dir=cache_dir, size=1)
+            self.assertEqual(0, batch_index.count_cached)
+
+    # Metadata scan reads the same publication information as full parsing
+    def test_publication_meta(self):
+        zip_file = '../data_test/9783657782116_BITS.zip'
+        pub = Publication.from_zip(zip_file)
+        pub_meta = Publication.from_zip_meta(zip_file)
+        self.assertEqual("ger", pub_meta.lang)
+        self.assertEqual(pub.jats_file, pub_meta.jats_file)
+        self.assertEqual([pub.title, pub.doi, pub.isbn, pub.page_count, pub.publisher, pub.year],
+                         [pub_meta.title, pub_meta.doi, pub_meta.isbn, pub_meta.page_count, pub_meta.publisher,
+                          pub_meta.year])
+        self.assertEqual([editor.full_name for editor in pub.editors],
+                         [editor.full_name for editor in pub_meta.editors])
+        self.assertIsNone(pub_meta.bib_refs)
+        file_names = ['9789004188846_BITS.zip', '9783657782116_BITS.zip', '9789047443735_BITS.zip']
+        with temp_batch_zip(file_names, {'broken_BITS.zip': b'not a zip'}) as zip_path:
+            # Language is set only on the book back, after the metadata
+            lang_zip_path = os.path.join(os.path.dirname(zip_path), 'lang_BITS.zip')
+            with zipfile.ZipFile('../data_test/9789004382855_BITS.zip') as pub_zip:
+                jats_file = [file_name for file_name in pub_zip.namelist() if file_name.endswith('.xml')][0]
+                jats = pub_zip.read(jats_file).decode('utf-8')
+            with zipfile.ZipFile(lang_zip_path, 'w') as lang_zip:
+                lang_zip.writestr(jats_file, jats.replace(' xml:lang="eng"', '').replace('<book-back',
+                                                                                          '<book-back xml:lang="eng"'))
+            self.assertEqual(["eng", "eng"],
+                             [Publication.from_zip(lang_zip_path).lang, Publication.from_zip_meta(lang_zip_path).lang])
+            for workers in [1, 2]:
+                batch = Batch.scan_zip(zip_path, workers=workers, chunk_size=2)
+                self.assertEqual(1, batch.errors_other)
+                self.assertEqual(file_names, [os.path.basename(pub.zip_path) for pub in batch.publications])
+                self.assertEqual(385, batch.publications[2].page_count)
+
+    # Streaming JATS parsing gives the same publication as tree parsing
+    def test_publication_stream(self):
+        zip_file = '../data_test/9789004382855_BITS.zip'
+        pub = Publication.from_zip(zip_file, extract_bib=True, extract_index=True, stream_jats=False)
+        pub_stream = Publication.from_zip(zip_file, extract_bib=True, extract_index=True, stream_jats=True)
+        self.assertEqual([pub.title, pub.lang, pub.doi, pub.isbn, pub.page_count],
+                         [pub_stream.title, pub_stream.lang, pub_stream.doi, pub_stream.isbn, pub_stream.page_count])
+        self.assertEqual(274, len(pub_stream.bib_refs))
+        self.assertEqual(1204, len(pub_stream.index_refs))
+        self.assertEqual([ref.text for ref in pub.bib_refs], [ref.text for ref in pub_stream.bib_refs])
+        self.assertEqual([(ref.text, ref.types) for ref in pub.index_refs],
+                         [(ref.text, ref.types) for ref in pub_stream.index_refs])
+        self.assertEqual(pub.index_files, pub_stream.index_files)
+
     # Check that generated uuid are distinct
     def test_resource_uuid(self):
         author = Contributor(UUID="3a9987f0-40c8-42d3-9ff8-24a5289ae978", type="author", surname="Smith", given_names="Mike")
@@ -1,10 +1,11 @@
 import unittest
 from model.publication import Publication
 from model.disambiguate_bibliographic import DisambiguateBibliographic
-from model.reference_bibliographic import Reference
+from model.reference_bibliographic import Reference, citation, citation_pattern, parse_hits
 from urllib.parse import quote
 from model.log_config import config_logger
 import csv
+import time
 from os import listdir
 from os.path import isfile, join
 
@@ -41,6 +42,67 @@ class TestRefBibParser(unittest.TestCase):
         self.assertEqual("D’Andria, F.", ref.author)
         self.assertEqual("Scavi nella zona del Kerameikos", ref.title)
 
+    # Reference parsing speed on bibliographies of books in data_test
+    def test_reference_parser_speed(self):
+        texts = []
+        for file_name in sorted(listdir('../data_test')):
+            if file_name.endswith('_BITS.zip'):
+                pub = Publication.from_zip(join('../data_test', file_name), extract_bib=True)
+                texts += [ref.text for ref in pub.bib_refs] + pub.bib_refs_with_errors
+        self.assertGreater(len(texts), 1000)
+        count_refs = 0
+        hits = dict(parse_hits)
+        start = time.perf_counter()
+        for ref_text in texts:
+            try:
+                Reference(ref_text)
+            except Exception:
+                pass
+            count_refs += 1
+        elapsed = time.perf_counter() - start
+        self.logger.info("Parsed %d references in %.2fs, %.0f references per second",
+                         count_refs, elapsed, count_refs / elapsed)
+        print("References per second:", round(count_refs / elapsed))
+        self.logger.info("Parser tier hits: %s", {tier: parse_hits[tier] - hits[tier] for tier in hits})
+
+    # Regex tier yields the same author, year and title as the grammar, editor marks are left to the grammar
+    def test_reference_parser_tiers(self):
+        texts = ["Brown,P.G.M. 1983 . “Title” x", "  ———. 1994a, Legal space. Oxford", "Smith,J.-P.1999,2000\tT",
+                 "—.2003 x"]
+        for text in texts:
+            res = citation.parseString(text)
+            match = citation_pattern.match(text.expandtabs())
+            author = res.author if isinstance(res.author, str) else res.author[0]
+            self.assertEqual([author, res.year[0], res.title],
+                             [match.group("author") or match.group("same"), match.group("year"), match.group("title")])
+        hits = dict(parse_hits)
+        ref = Reference("Smith,J.ed. 1999. Title. Oxford")
+        self.assertEqual(["Smith,J.", "1999", "Title"], [ref.author, ref.year, ref.title])
+        ref = Reference("Andrewes, A. 1961. “The Greek Tyrants”. London")
+        self.assertEqual(["1961", "The Greek Tyrants"], [ref.year, ref.title])
+        self.assertEqual("Title", Reference(texts[0]).title)
+        self.assertEqual({"regex": 1, "grammar": 1, "heuristic": 1}, {tier: parse_hits[tier] - hits[tier] for tier in hits})
+
+    # References are parsed on first access to parsed fields, deserialized references keep stored values
+    def test_reference_parser_lazy(self):
+        hits = dict(parse_hits)
+        ref = Reference("Andrewes, A. 1961. “The Greek Tyrants”. London")
+        props = dict(ref.props)
+        self.assertEqual(1, parse_hits["heuristic"] - hits["heuristic"])
+        self.assertEqual("The Greek Tyrants", props["title"])
+        props["title"] = "Stored title"
+        self.assertEqual("Stored title", Reference.deserialize(dict(props)).title)
+        self.assertEqual("Stored title", Reference.from_dict(dict(props)).title)
+        refs = [Reference("Short"), Reference("——. 1994. “Legal space in classical Athens”")]
+        self.assertEqual(1, parse_hits["heuristic"] - hits["heuristic"])
+        self.assertEqual(refs[:1], Reference.parse_all(refs))
+        self.assertEqual(1, parse_hits["regex"] - hits["regex"])
+        self.assertEqual("Legal space in classical Athens", refs[1].title)
+        # Text of unparsed references is serialized normalized
+        ref = Reference('Smith, J. 1999. "Quoted" title\nnext line')
+        self.assertEqual("Smith, J. 1999. ”Quoted” title next line", ref.text)
+        self.assertIn('text: "Smith, J. 1999. ”Quoted” title next line"', ref.serialize())
+
     # Disambiguate selected references via GoogleAPI
     def test_disambiguation_google(self):
         text_refs = [
@@ -1,8 +1,10 @@
 import unittest
-from model.reference_index import IndexReference
+from model.reference_index import IndexReference, scan_pattern2, pattern2
+from model.publication import Publication
 from model.batch import Batch
 from model.disambiguate_index import DisambiguateIndex
 from model.log_config import config_logger
+from pyparsing import ParseException
 import csv
 
 
@@ -130,6 +132,44 @@ class TestIndexParser(unittest.TestCase):
         self.assertEqual(15, len(nested_idx.refs))
         self.assertEqual("108–9/126–7", nested_idx.refs[14].locus)
 
+    # Scanner matches index entries as pattern 2 grammar does, or leaves them to the grammar
+    def test_index_scanner_pattern2(self):
+        pub = Publication.from_zip('../data_test/9789004382855_BITS.zip', extract_index=True)
+        texts = [ref.text for ref in pub.index_refs] + [
+            "Antioch  10; 24; 79; 83; 85; 89–92;  105–107", "Athens\t12 f. 14,15 ;16 rest", "Cos 3n, 4–  x",
+            "Delos 25 see also Rheneia, Mykonos", "Nike 14 See Victory", "Olympia ²³ f 12", "Sparta", "12 Thebes",
+            " Zeus ,; 5 ", "Argos 4 ſee Argolis", "Hera\xa07 8"]
+        count_scanned = 0
+        for text in texts:
+            # Entries are parsed in a loop over the rest of the text
+            while text:
+                try:
+                    res = pattern2.parseString(text)
+                except ParseException:
+                    self.assertIsNone(scan_pattern2(text))
+                    break
+                scanned = scan_pattern2(text)
+                if scanned is not None:
+                    count_scanned += 1
+                    self.assertEqual([list(res.label), list(res.occurrences), res.alias, res.rest, res.locus],
+                                     [scanned.label, list(scanned.occurrences), scanned.alias, scanned.rest,
+                                      scanned.locus])
+                text = res.rest
+        self.assertGreater(count_scanned, 1000)
+
+    # Deserialized index parts are restored from the text on first access
+    def test_index_parser_lazy(self):
+        idx = IndexReference("Adonis (Plato Comicus), 160, 161, 207", types=["rerum"])
+        restored = IndexReference.deserialize(dict(idx.props))
+        self.assertNotIn("refs", restored.__dict__)
+        self.assertEqual(["rerum"], restored.types)
+        self.assertEqual("Adonis (Plato Comicus)", restored.refs[0].label)
+        self.assertEqual(["160", "161", "207"], restored.refs[0].occurrences)
+        # Text of unparsed references is serialized normalized
+        idx = IndexReference('"Adonis"\n(Plato Comicus), 160', types=["rerum"])
+        self.assertIn('text: "\'Adonis\' (Plato Comicus), 160"', idx.serialize())
+        self.assertNotIn("refs", idx.__dict__)
+
     # Index is disambiguated via Hucitlib
     def test_disambiguate_index_hucitlib(self):
         self.logger.info("Testing Hucitlib...")